@@ -12,7 +12,6 @@ from typing import List, Optional
 import groq
 import pandas as pd
 import uvicorn
-from dotenv import load_dotenv
 from fastapi import (
     Depends, 
     FastAPI, 
@@ -40,11 +39,20 @@ from src.routes.chat_routes import router as chat_router
 from src.routes.code_routes import router as code_router
 from src.routes.session_routes import router as session_router, get_session_id_dependency
 from src.schemas.query_schemas import QueryRequest
-from src.utils.logger import Logger
+from src.utils.env import load_env
+from src.utils.logger import Logger, timing_scope
+from src.utils.prediction_cache import PredictionCache
+from src.utils.prompt_caching import PromptCachingChatAdapter
 
 
 logger = Logger("app", see_time=True, console_log=False)
-load_dotenv()
+load_env()
+
+# Chat names depend only on the (normalized) query, so repeats skip the LM
+chat_name_cache = PredictionCache(maxsize=512, name="chat_name")
+# Chat-name LM calls currently running, keyed like chat_name_cache, so
+# concurrent identical requests share one call instead of each paying for it
+chat_name_inflight = {}
 
 styling_instructions = [
     """
@@ -157,6 +165,10 @@ else:
         max_tokens=DEFAULT_MODEL_CONFIG["max_tokens"]
     )
 
+# The adapter (unlike the LM) is shared by every session; it keeps the
+# static signature prompts cacheable on providers that need a marker
+dspy.configure(adapter=PromptCachingChatAdapter())
+
 # Function to get model config from session or use default
 def get_session_lm(session_state):
     """Get the appropriate LM instance for a session, or default if not configured"""
@@ -283,7 +295,7 @@ class AppState:
         return self.ai_manager.tokenizer
     
     def get_chat_history_name_agent(self):
-        return dspy.Predict(self.chat_name_agent)
+        return chat_name_predictor
 
 # Initialize FastAPI app with state
 app = FastAPI(title="Auto-Analyst API")
@@ -597,8 +609,9 @@ async def _generate_streaming_responses(session_state: dict, query: str, session
         # Add chat context from previous messages
         enhanced_query = _prepare_query_with_context(query, session_state)
         
-        # Use the session model for this specific request
-        with dspy.context(lm=session_lm):
+        # Use the session model for this specific request; per-stage timings
+        # from get_plan/execute_plan are logged as one line when it ends
+        with dspy.context(lm=session_lm), timing_scope("chat_with_all", logger):
             try:
                 # Get the plan
                 plan_response = await asyncio.wait_for(
@@ -682,10 +695,13 @@ async def _generate_streaming_responses(session_state: dict, query: str, session
                     
                     # Track agent usage for future batch DB write
                     if session_state.get("user_id"):
+                        # Serialize once; the inputs carry the full dataset context
+                        inputs_text = str(inputs)
+                        response_text = str(response)
                         agent_tokens = _estimate_tokens(
                             ai_manager=app.state.ai_manager,
-                            input_text=str(inputs),
-                            output_text=str(response)
+                            input_text=inputs_text,
+                            output_text=response_text
                         )
                         
                         # Get appropriate model name for code combiner
@@ -700,8 +716,8 @@ async def _generate_streaming_responses(session_state: dict, query: str, session
                             model_name=model_name,
                             prompt_tokens=agent_tokens["prompt"],
                             completion_tokens=agent_tokens["completion"],
-                            query_size=len(str(inputs)),
-                            response_size=len(str(response)),
+                            query_size=len(inputs_text),
+                            response_size=len(response_text),
                             processing_time_ms=int((time.time() - overall_start_time) * 1000),
                             is_streaming=True
                         ))
@@ -724,11 +740,8 @@ async def _generate_streaming_responses(session_state: dict, query: str, session
             # Batch write usage records to DB
             if usage_records and session_state.get("user_id"):
                 try:
-                    # In a real implementation, you would batch these writes
-                    # For now, we're writing them one by one but could be optimized
-                    ai_manager = app.state.get_ai_manager()
-                    for record in usage_records:
-                        ai_manager.save_usage_to_db(**record)
+                    # One transaction for every agent's usage in this response
+                    app.state.get_ai_manager().save_usage_records_to_db(usage_records)
                 except Exception as db_error:
                     logger.log_message(f"Failed to save usage records: {str(db_error)}", level=logging.ERROR)
            
@@ -845,13 +858,33 @@ async def chat_history_name(request: dict, session_id: str = Depends(get_session
     query = request.get("query")
     name = None
     
-    lm = dspy.LM(model="gpt-4o-mini", max_tokens=300, temperature=0.5)
+    cache_key = str(query).strip().lower()
+    cached_name = chat_name_cache.get(cache_key)
+    if cached_name is not None:
+        return {"name": cached_name}
     
-    with dspy.context(lm=lm):
-        name = app.state.get_chat_history_name_agent()(query=str(query))
+    inflight = chat_name_inflight.get(cache_key)
+    if inflight is None:
+        inflight = asyncio.ensure_future(asyncio.to_thread(_generate_chat_name, str(query)))
+        chat_name_inflight[cache_key] = inflight
+        inflight.add_done_callback(lambda _: chat_name_inflight.pop(cache_key, None))
+    
+    # Shield so one caller disconnecting doesn't cancel the shared call
+    name = await asyncio.shield(inflight)
+    
+    if name:
+        chat_name_cache.set(cache_key, name.name)
         
     return {"name": name.name if name else "New Chat"}
 
+
+def _generate_chat_name(query: str):
+    """Run the chat-name agent; blocking, so called off the event loop"""
+    lm = dspy.LM(model="gpt-4o-mini", max_tokens=300, temperature=0.5)
+    
+    with dspy.context(lm=lm):
+        return app.state.get_chat_history_name_agent()(query=query)
+
 # In the section where routers are included, add the session_router
 app.include_router(chat_router)
 app.include_router(analytics_router)
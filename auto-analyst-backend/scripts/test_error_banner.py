@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.routes.code_routes import _ERROR_BANNER_RE, identify_error_blocks
+
+# Output of execute_code_from_markdown when two agent blocks fail
+error_output = (
+    "=== ERROR IN PREPROCESSING_AGENT ===\n"
+    "TypeError: unsupported operand\n"
+    "\n"
+    "=== ERROR IN DATA_VIZ_AGENT ===\n"
+    "ValueError: bad column\n"
+)
+
+code = (
+    "# preprocessing_agent code start\n"
+    "df['a'] = df['a'] + 'x'\n"
+    "# preprocessing_agent code end\n"
+    "# data_viz_agent code start\n"
+    "fig = px.bar(df, x='missing')\n"
+    "# data_viz_agent code end\n"
+)
+
+matches = _ERROR_BANNER_RE.findall(error_output)
+print(f"Banner matches: {matches}")
+
+# Each section stops before the next banner, so no "=" leaks into the message
+# and the second banner is still found
+assert matches[0][1].strip() == "TypeError: unsupported operand"
+assert [name for name, _ in matches] == ["PREPROCESSING_AGENT", "DATA_VIZ_AGENT"]
+
+faulty_blocks = identify_error_blocks(code, error_output)
+print(f"Faulty blocks: {[block[0] for block in faulty_blocks]}")
+assert [block[0] for block in faulty_blocks] == ["preprocessing_agent", "data_viz_agent"]
+
+print("OK")
@@ -1,15 +1,59 @@
 import dspy
+import httpx
+import litellm
 import src.agents.memory_agents as m
 import asyncio
+import atexit
+import contextvars
+import json
+import orjson
 from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from types import MappingProxyType
 import os
-from dotenv import load_dotenv
+import sys
 import logging
-from src.utils.logger import Logger
-load_dotenv()
+from llama_index.core import QueryBundle
+from src.utils.env import load_env
+from src.utils.logger import Logger, stage_timer
+from src.utils.prompts import minify_signature_prompts
+from src.utils.prediction_cache import PredictionCache, stable_hash
+
+load_env()
 
 logger = Logger("agents", see_time=True, console_log=False)
 
+# Share one keep-alive connection pool across all agent threads so parallel
+# LM calls reuse TCP/TLS sessions instead of opening a new one per request
+LM_HTTP_POOL_SIZE = int(os.getenv("LM_HTTP_POOL_SIZE", 32))
+litellm.client_session = httpx.Client(
+    limits=httpx.Limits(max_connections=LM_HTTP_POOL_SIZE, max_keepalive_connections=LM_HTTP_POOL_SIZE),
+    timeout=600,
+)
+
+# Context keys execute_plan builds for every request; agent inputs are
+# resolved against these once at init instead of per dispatched agent
+PLAN_CONTEXT_KEYS = frozenset({"dataset", "styling_index", "hint", "goal"})
+
+# Upper bound on planned agents running at once within one execute_plan call
+MAX_PARALLEL_AGENTS = int(os.getenv("MAX_PARALLEL_AGENTS", 8))
+
+# One pool for agent calls and retriever lookups across all sessions, so
+# the thread count stays bounded however many analyst instances exist
+AGENT_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AGENT_POOL_SIZE", 32)),
+    thread_name_prefix="agent",
+)
+atexit.register(AGENT_EXECUTOR.shutdown, wait=False, cancel_futures=True)
+
+# Plans keyed by (model, goal, dataset context, agents); users frequently
+# re-ask the same goal on the same dataset, so repeats skip the planner LM
+plan_cache = PredictionCache(maxsize=int(os.getenv("PLAN_CACHE_SIZE", 256)), name="plan")
+
+# Shared fallback for agents the planner gave no instructions; only ever
+# read and serialized, never mutated
+EMPTY_PLAN_INSTRUCTIONS = {"create": [], "use": [], "instruction": ""}
+
 
 AGENTS_WITH_DESCRIPTION = {
     "preprocessing_agent": "Cleans and prepares a DataFrame using Pandas and NumPy—handles missing values, detects column types, and converts date strings to datetime.",
@@ -43,11 +87,56 @@ PLANNER_AGENTS_WITH_DESCRIPTION = {
     ),
 }
 
+# Read-only lookup tables: freeze them and intern the keys
+AGENTS_WITH_DESCRIPTION = MappingProxyType({sys.intern(k): v for k, v in AGENTS_WITH_DESCRIPTION.items()})
+PLANNER_AGENTS_WITH_DESCRIPTION = MappingProxyType({sys.intern(k): v for k, v in PLANNER_AGENTS_WITH_DESCRIPTION.items()})
+
+@lru_cache(maxsize=64)
 def get_agent_description(agent_name, is_planner=False):
-    if is_planner:
-        return PLANNER_AGENTS_WITH_DESCRIPTION[agent_name.lower()] if agent_name.lower() in PLANNER_AGENTS_WITH_DESCRIPTION else "No description available for this agent"
-    else:
-        return AGENTS_WITH_DESCRIPTION[agent_name.lower()] if agent_name.lower() in AGENTS_WITH_DESCRIPTION else "No description available for this agent"
+    descriptions = PLANNER_AGENTS_WITH_DESCRIPTION if is_planner else AGENTS_WITH_DESCRIPTION
+    return descriptions.get(agent_name.lower(), "No description available for this agent")
+
+
+# Neighbour keys used in per-agent plan instructions; agent names come from
+# a small fixed set so the formatted keys are cached after first use
+@lru_cache(maxsize=256)
+def _previous_agent_key(agent_name):
+    return f"Previous Agent {agent_name}"
+
+
+@lru_cache(maxsize=256)
+def _next_agent_key(agent_name):
+    return f"Next Agent {agent_name}"
+
+
+def _shared_embed_model(first, *others):
+    """Return the embed model every retriever uses, or None if they differ.
+
+    Retrievers sharing a model can search with one precomputed query
+    embedding instead of each embedding the query again.
+    """
+    model = getattr(first, "_embed_model", None)
+    if model is None or any(getattr(r, "_embed_model", None) is not model for r in others):
+        return None
+    return model
+
+
+# Cached plans come back with the same strings, so parse each one once.
+# Results are shared between callers and must be treated as read-only
+@lru_cache(maxsize=256)
+def _parse_plan_list(plan_text):
+    """Split a planner 'plan' string such as 'a -> b' into agent names"""
+    plan_text = plan_text.replace("Plan", "").replace(":", "").strip()
+    return tuple(agent.strip() for agent in plan_text.split("->") if agent.strip())
+
+
+@lru_cache(maxsize=256)
+def _parse_plan_instructions(raw_instr):
+    """Parse the planner's plan_instructions JSON, or {} if it is malformed"""
+    try:
+        return orjson.loads(raw_instr)
+    except Exception:
+        return {}
 
 
 # Agent to make a Chat history name from a query
@@ -217,23 +306,18 @@ You are given:
 3.  Handle missing values :
 
     ```python
-    for col in numeric_cols:
-        processed_df[col] = processed_df[col].fillna(processed_df[col].median())
+    processed_df[numeric_cols] = processed_df[numeric_cols].fillna(processed_df[numeric_cols].median())
     
-    for col in categorical_cols:
-        processed_df[col] = processed_df[col].fillna(processed_df[col].mode()[0] if not processed_df[col].mode().empty else 'Unknown')
+    modes = processed_df[categorical_cols].mode()
+    if not modes.empty:
+        processed_df[categorical_cols] = processed_df[categorical_cols].fillna(modes.iloc[0])
+    processed_df[categorical_cols] = processed_df[categorical_cols].fillna('Unknown')
     ```
 
-4.  Convert string columns to datetime safely :
+4.  Convert string columns to datetime with one vectorized call per column (invalid values become NaT) :
 
     ```python
-    def safe_to_datetime(x):
-        try:
-            return pd.to_datetime(x, errors='coerce', cache=False)
-        except (ValueError, TypeError):
-            return pd.NaT
-    
-    cleaned_df['date_column'] = cleaned_df['date_column'].apply(safe_to_datetime)
+    cleaned_df['date_column'] = pd.to_datetime(cleaned_df['date_column'], errors='coerce', cache=True)
     ```
 
 > Replace `processed_df`,'cleaned_df' and `date_column` with whatever names the user or planner provides.
@@ -600,6 +684,16 @@ class planner_sk_learn_agent(dspy.Signature):
     code = dspy.OutputField(desc="Scikit-learn based machine learning code")
     summary = dspy.OutputField(desc="Explanation of the ML approach and evaluation")
 
+# The planner prompts are sent as the system prompt on every call
+minify_signature_prompts(
+    analytical_planner,
+    planner_preprocessing_agent,
+    planner_data_viz_agent,
+    planner_statistical_analytics_agent,
+    planner_sk_learn_agent,
+)
+
+
 class goal_refiner_agent(dspy.Signature):
     # Called to refine the query incase user query not elaborate
     """You take a user-defined goal given to a AI data analyst planner agent, 
@@ -620,17 +714,18 @@ class preprocessing_agent(dspy.Signature):
         numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
 
     2. Handle Missing Values
-    - Numeric columns: Impute missing values using the mean of each column
-    - Categorical columns: Impute missing values using the mode of each column
+    - Numeric columns: Impute missing values using the mean of each column, in one call:
+        df[numeric_columns] = df[numeric_columns].fillna(df[numeric_columns].mean())
+    - Categorical columns: Impute missing values using the mode of each column, falling back to 'Unknown':
+        modes = df[categorical_columns].mode()
+        if not modes.empty:
+            df[categorical_columns] = df[categorical_columns].fillna(modes.iloc[0])
+        df[categorical_columns] = df[categorical_columns].fillna('Unknown')
 
     3. Convert Date Strings to Datetime
-    - For any column suspected to represent dates (in string format), convert it to datetime using:
-        def safe_to_datetime(date):
-            try:
-                return pd.to_datetime(date, errors='coerce', cache=False)
-            except (ValueError, TypeError):
-                return pd.NaT
-        df['datetime_column'] = df['datetime_column'].apply(safe_to_datetime)
+    - For any column suspected to represent dates (in string format), convert it to datetime with one vectorized call (invalid values become NaT):
+        df['datetime_column'] = pd.to_datetime(df['datetime_column'], errors='coerce', cache=True)
+    - Do not convert dates row by row with .apply
     - Replace 'datetime_column' with the actual column names containing date-like strings
 
     Important Notes:
@@ -956,47 +1051,76 @@ class auto_analyst_ind(dspy.Module):
         self.agent_desc = []
         
         # Create modules from agent signatures
-        for i, a in enumerate(agents):
+        for a in agents:
             name = a.__pydantic_core_schema__['schema']['model_name']
             self.agents[name] = dspy.ChainOfThoughtWithHint(a)
-            self.agent_inputs[name] = {x.strip() for x in str(agents[i].__pydantic_core_schema__['cls']).split('->')[0].split('(')[1].split(',')}
-            self.agent_desc.append(get_agent_description(name))
+            self.agent_inputs[name] = frozenset(a.input_fields)
+            self.agent_desc.append((name, get_agent_description(name)))
+        
+        # Every query sends the same agent descriptions, so render them once
+        self.agent_desc = tuple(self.agent_desc)
+        self._agent_desc_str = "\n".join(f"{name}: {desc}" for name, desc in self.agent_desc)
             
         # Initialize components
-        self.memory_summarize_agent = dspy.ChainOfThought(m.memory_summarize_agent)
         self.dataset = retrievers['dataframe_index'].as_retriever(k=1)
         self.styling_index = retrievers['style_index'].as_retriever(similarity_top_k=1)
-        self.code_combiner_agent = dspy.ChainOfThought(code_combiner_agent)
+        self._embed_model = _shared_embed_model(self.dataset, self.styling_index)
+        
+        # Shared pool; app.py builds an instance per request
+        self.executor = AGENT_EXECUTOR
+    
+    # Helper agents are built on first use; most requests never touch them
+    @cached_property
+    def memory_summarize_agent(self):
+        return dspy.ChainOfThought(m.memory_summarize_agent)
+    
+    @cached_property
+    def code_combiner_agent(self):
+        return dspy.ChainOfThought(code_combiner_agent)
+    
+    def _retrieve_context(self, query, needed=PLAN_CONTEXT_KEYS):
+        """Fetch the dataset and styling context the agents need, concurrently"""
+        # Skip retrievers no agent consumes
+        if 'dataset' in needed and 'styling_index' in needed and self._embed_model is not None:
+            # Both indexes use the same embed model: embed the query once
+            bundle = QueryBundle(query_str=query, embedding=self._embed_model.get_query_embedding(query))
+            return self.dataset.retrieve(bundle)[0].text, self.styling_index.retrieve(bundle)[0].text
         
-        # Initialize thread pool
-        self.executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() * 2))
+        # Otherwise overlap the two round-trips
+        styling_future = None
+        if 'styling_index' in needed:
+            styling_future = self.executor.submit(self.styling_index.retrieve, query)
+        dataset_text = self.dataset.retrieve(query)[0].text if 'dataset' in needed else ""
+        styling_text = styling_future.result()[0].text if styling_future is not None else ""
+        return dataset_text, styling_text
     
     def execute_agent(self, specified_agent, inputs):
         """Execute agent and generate memory summary in parallel"""
+        key = specified_agent.strip()
         try:
             # Execute main agent
-            agent_result = self.agents[specified_agent.strip()](**inputs)
-            return specified_agent.strip(), dict(agent_result)
+            agent_result = self.agents[key](**inputs)
+            return key, dict(agent_result)
             
         except Exception as e:
-            return specified_agent.strip(), {"error": str(e)}
+            return key, {"error": str(e)}
 
     def execute_agent_with_memory(self, specified_agent, inputs, query):
         """Execute agent and generate memory summary in parallel"""
+        key = specified_agent.strip()
         try:
             # Execute main agent
-            agent_result = self.agents[specified_agent.strip()](**inputs)
-            agent_dict = dict(agent_result)
+            agent_result = self.agents[key](**inputs)
             
             # Generate memory summary
             memory_result = self.memory_summarize_agent(
-                agent_response=specified_agent+' '+agent_dict['code']+'\n'+agent_dict['summary'],
+                agent_response=specified_agent+' '+agent_result.code+'\n'+agent_result.summary,
                 user_goal=query
             )
             
             return {
-                specified_agent.strip(): agent_dict,
-                'memory_'+specified_agent.strip(): str(memory_result.summary)
+                key: dict(agent_result),
+                'memory_'+key: str(memory_result.summary)
             }
         except Exception as e:
             return {"error": str(e)}
@@ -1010,20 +1134,20 @@ class auto_analyst_ind(dspy.Module):
                 return self.execute_multiple_agents(query, agent_list)
             
             # Process query with specified agent (single agent case)
+            key = specified_agent.strip()
             dict_ = {}
-            dict_['dataset'] = self.dataset.retrieve(query)[0].text
-            dict_['styling_index'] = self.styling_index.retrieve(query)[0].text
+            dict_['dataset'], dict_['styling_index'] = self._retrieve_context(query, self.agent_inputs[key])
             dict_['hint'] = []
             dict_['goal'] = query
-            dict_['Agent_desc'] = str(self.agent_desc)
+            dict_['Agent_desc'] = self._agent_desc_str
 
             # Prepare inputs
-            inputs = {x:dict_[x] for x in self.agent_inputs[specified_agent.strip()]}
-            inputs['hint'] = str(dict_['hint']).replace('[','').replace(']','')
+            inputs = {x:dict_[x] for x in self.agent_inputs[key]}
+            inputs['hint'] = ",".join(map(str, dict_['hint']))
             
             # Execute agent
-            result = self.agents[specified_agent.strip()](**inputs)
-            output_dict = {specified_agent.strip(): dict(result)}
+            result = self.agents[key](**inputs)
+            output_dict = {key: dict(result)}
 
             if "error" in output_dict:
                 return {"response": f"Error executing agent: {output_dict['error']}"}
@@ -1037,12 +1161,12 @@ class auto_analyst_ind(dspy.Module):
         """Execute multiple agents sequentially on the same query"""
         try:
             # Initialize resources
+            needed = frozenset().union(*(self.agent_inputs[a] for a in agent_list if a in self.agent_inputs))
             dict_ = {}
-            dict_['dataset'] = self.dataset.retrieve(query)[0].text
-            dict_['styling_index'] = self.styling_index.retrieve(query)[0].text
+            dict_['dataset'], dict_['styling_index'] = self._retrieve_context(query, needed)
             dict_['hint'] = []
             dict_['goal'] = query
-            dict_['Agent_desc'] = str(self.agent_desc)
+            dict_['Agent_desc'] = self._agent_desc_str
             
             results = {}
             code_list = []
@@ -1055,7 +1179,7 @@ class auto_analyst_ind(dspy.Module):
                 
                 # Prepare inputs for this agent
                 inputs = {x:dict_[x] for x in self.agent_inputs[agent_name] if x in dict_}
-                inputs['hint'] = str(dict_['hint']).replace('[','').replace(']','')
+                inputs['hint'] = ",".join(map(str, dict_['hint']))
                 
                 # Execute agent
                 agent_result = self.agents[agent_name](**inputs)
@@ -1076,125 +1200,219 @@ class auto_analyst_ind(dspy.Module):
 class auto_analyst(dspy.Module):
     """Main analyst module that coordinates multiple agents using a planner"""
     
-    def __init__(self, agents, retrievers):
+    def __init__(self, agents, retrievers, executor=None):
         # Initialize agent modules and retrievers
         self.agents = {}
         self.agent_inputs = {}
         self.agent_desc = []
         
-        for i, a in enumerate(agents):
+        for a in agents:
             name = a.__pydantic_core_schema__['schema']['model_name']
             self.agents[name] = dspy.ChainOfThought(a)
-            self.agent_inputs[name] = {x.strip() for x in str(agents[i].__pydantic_core_schema__['cls']).split('->')[0].split('(')[1].split(',')}
-            self.agent_desc.append({name: get_agent_description(name)})
+            self.agent_inputs[name] = frozenset(a.input_fields)
+            self.agent_desc.append((name, get_agent_description(name)))
+        
+        # Every query sends the same agent descriptions, so render them once
+        self.agent_desc = tuple(self.agent_desc)
+        self._agent_desc_str = "\n".join(f"{name}: {desc}" for name, desc in self.agent_desc)
+        
+        # Precompute which shared context keys each agent receives
+        self._agent_non_plan_inputs = {
+            name: tuple(k for k in inputs if k != "plan_instructions" and k in PLAN_CONTEXT_KEYS)
+            for name, inputs in self.agent_inputs.items()
+        }
         
         # Initialize coordination agents
         self.planner = dspy.ChainOfThought(analytical_planner)
-        self.refine_goal = dspy.ChainOfThought(goal_refiner_agent)
-        self.code_combiner_agent = dspy.ChainOfThought(code_combiner_agent)
-        self.story_teller = dspy.ChainOfThought(story_teller_agent)
-        self.memory_summarize_agent = dspy.ChainOfThought(m.memory_summarize_agent)
                 
         # Initialize retrievers
         self.dataset = retrievers['dataframe_index'].as_retriever(k=1)
         self.styling_index = retrievers['style_index'].as_retriever(similarity_top_k=1)
+        self._embed_model = _shared_embed_model(self.dataset, self.styling_index)
         
-        # Initialize thread pool for parallel execution
-        self.executor = ThreadPoolExecutor(max_workers=min(len(agents) + 2, os.cpu_count() * 2))
+        # get_plan and execute_plan retrieve for the same query, so remember
+        # the last few lookups. The caches live on the instance, which is
+        # rebuilt whenever the session's retrievers change
+        self._embed_query = lru_cache(maxsize=128)(self._compute_query_embedding)
+        self._retrieve_dataset = lru_cache(maxsize=128)(self._fetch_dataset_context)
+        self._retrieve_styling = lru_cache(maxsize=128)(self._fetch_styling_context)
+        
+        # Cap on agents in flight per plan
+        self.max_parallel = MAX_PARALLEL_AGENTS
+        
+        # Pool planned agents run on. Defaults to the shared agent pool so
+        # LM calls don't crowd the event loop's default pool used by the
+        # routes; pass a dedicated executor to isolate or size it separately
+        self.executor = executor if executor is not None else AGENT_EXECUTOR
+
+    # Coordination helpers outside the plan/execute path, built on first use
+    @cached_property
+    def refine_goal(self):
+        return dspy.ChainOfThought(goal_refiner_agent)
+
+    @cached_property
+    def code_combiner_agent(self):
+        return dspy.ChainOfThought(code_combiner_agent)
+
+    @cached_property
+    def story_teller(self):
+        return dspy.ChainOfThought(story_teller_agent)
+
+    @cached_property
+    def memory_summarize_agent(self):
+        return dspy.ChainOfThought(m.memory_summarize_agent)
+
+    def _compute_query_embedding(self, query):
+        return self._embed_model.get_query_embedding(query)
+
+    def _query_bundle(self, query):
+        """Reuse one query embedding across both indexes when they share a model"""
+        if self._embed_model is None:
+            return query
+        return QueryBundle(query_str=query, embedding=self._embed_query(query))
+
+    def _fetch_dataset_context(self, query):
+        return self.dataset.retrieve(self._query_bundle(query))[0].text
+
+    def _fetch_styling_context(self, query):
+        return self.styling_index.retrieve(self._query_bundle(query))[0].text
 
     def execute_agent(self, agent_name, inputs):
         """Execute a single agent with given inputs"""
+        key = agent_name.strip()
         try:
-            result = self.agents[agent_name.strip()](**inputs)
-            return agent_name.strip(), dict(result)
+            with stage_timer(f"agent:{key}"):
+                result = self.agents[key](**inputs)
+            return key, dict(result)
         except Exception as e:
-            return agent_name.strip(), {"error": str(e)}
+            return key, {"error": str(e)}
 
     def get_plan(self, query):
         """Get the analysis plan"""
+        # The planner only consumes the dataset context, so the styling
+        # retriever is left for execute_plan where agents actually need it
         dict_ = {}
-        dict_['dataset'] = self.dataset.retrieve(query)[0].text
-        dict_['styling_index'] = self.styling_index.retrieve(query)[0].text
+        with stage_timer("retrieve_dataset"):
+            dict_['dataset'] = self._retrieve_dataset(query)
         dict_['goal'] = query
-        dict_['Agent_desc'] = str(self.agent_desc)
+        dict_['Agent_desc'] = self._agent_desc_str
+        
+        cache_key = stable_hash(
+            str(getattr(dspy.settings.lm, "model", "")),
+            dict_['goal'].strip(),
+            dict_['dataset'],
+            dict_['Agent_desc']
+        )
+        cached_plan = plan_cache.get(cache_key)
+        if cached_plan is not None:
+            return dict(cached_plan)
         
-        plan = self.planner(goal=dict_['goal'], dataset=dict_['dataset'], Agent_desc=dict_['Agent_desc'])
+        with stage_timer("planner"):
+            plan = self.planner(goal=dict_['goal'], dataset=dict_['dataset'], Agent_desc=dict_['Agent_desc'])
+        # Only cache plans that actually name agents to run. The cache keeps
+        # the Prediction itself, so each caller gets exactly one dict copy
+        if plan.get("plan"):
+            plan_cache.set(cache_key, plan)
         return dict(plan)
 
     async def execute_plan(self, query, plan):
         """Execute the plan and yield results as they complete"""
-        dict_ = {}
-        dict_['dataset'] = self.dataset.retrieve(query)[0].text
-        dict_['styling_index'] = self.styling_index.retrieve(query)[0].text
-        dict_['hint'] = []
-        dict_['goal'] = query
-        
-        import json
-
-        # Clean and split the plan string into agent names
-        plan_text = plan.get("plan", "").replace("Plan", "").replace(":", "").strip()
-        plan_list = [agent.strip() for agent in plan_text.split("->") if agent.strip()]
-
-        # Parse the attached plan_instructions into a dict
-        raw_instr = plan.get("plan_instructions", {})
-        if isinstance(raw_instr, str):
-            try:
-                plan_instructions = json.loads(raw_instr)
-            except Exception:
+        with stage_timer("parse_plan"):
+            # Clean and split the plan string into agent names
+            plan_list = _parse_plan_list(plan.get("plan", ""))
+
+            # Parse the attached plan_instructions into a dict
+            raw_instr = plan.get("plan_instructions", {})
+            if isinstance(raw_instr, (str, bytes)):
+                plan_instructions = _parse_plan_instructions(raw_instr)
+            elif isinstance(raw_instr, dict):
+                plan_instructions = raw_instr
+            else:
                 plan_instructions = {}
-        elif isinstance(raw_instr, dict):
-            plan_instructions = raw_instr
-        else:
-            plan_instructions = {}
 
         # If no plan was produced, short-circuit
         if not plan_list:
             yield "plan_not_found", dict(plan), {"error": "No plan found"}
             return
 
+        # Only run the retrievers some planned agent actually reads
+        needed = frozenset().union(*(self._agent_non_plan_inputs.get(a, ()) for a in plan_list))
+        dict_ = {}
+        with stage_timer("retrieve_context"):
+            dict_['dataset'] = self._retrieve_dataset(query) if 'dataset' in needed else ""
+            dict_['styling_index'] = self._retrieve_styling(query) if 'styling_index' in needed else ""
+        dict_['hint'] = []
+        dict_['goal'] = query
+
+        # Look up each planned agent's instruction once; neighbours reuse them.
+        # Single-agent plans have no neighbours, so skip the lookup entirely
+        single_agent = len(plan_list) == 1
+        instr_by_agent = {} if single_agent else {
+            agent: plan_instructions.get(agent, EMPTY_PLAN_INSTRUCTIONS).get("instruction", "")
+            for agent in plan_list
+        }
+
+        # Bound how many agents are in flight at once
+        semaphore = asyncio.Semaphore(self.max_parallel)
+
+        async def run_agent(agent_name, inputs):
+            async with semaphore:
+                # Mirror asyncio.to_thread so context still reaches the worker
+                ctx = contextvars.copy_context()
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.executor, ctx.run, self.execute_agent, agent_name, inputs
+                )
+
         # Launch each agent in parallel, attaching its own instructions
+        # (plan_list entries are already stripped above)
         futures = []
         for idx, agent_name in enumerate(plan_list):
-            key = agent_name.strip()
+            key = agent_name
             # gather input fields except plan_instructions
-            inputs = {
-                param: dict_[param]
-                for param in self.agent_inputs[key]
-                if param != "plan_instructions"
-            }
+            inputs = {k: dict_[k] for k in self._agent_non_plan_inputs[key]}
             
             # attach the specific instructions for this agent with prev/next format
             if "plan_instructions" in self.agent_inputs[key]:
                 # Get current agent instructions
-                current_instructions = plan_instructions.get(key, {"create": [], "use": [], "instruction": ""})
+                current_instructions = plan_instructions.get(key) or EMPTY_PLAN_INSTRUCTIONS
                 
                 # Format instructions with your_task first
                 formatted_instructions = {"your_task": current_instructions}
                 
-                # Add previous agent instructions if available
-                if idx > 0:
-                    prev_agent = plan_list[idx-1].strip()
-                    prev_instructions = plan_instructions.get(prev_agent, {}).get("instruction", "")
-                    formatted_instructions[f"Previous Agent {prev_agent}"] = prev_instructions
-                
-                # Add next agent instructions if available
-                if idx < len(plan_list) - 1:
-                    next_agent = plan_list[idx+1].strip()
-                    next_instructions = plan_instructions.get(next_agent, {}).get("instruction", "")
-                    formatted_instructions[f"Next Agent {next_agent}"] = next_instructions
-                
+                if not single_agent:
+                    # Add previous agent instructions if available
+                    if idx > 0:
+                        prev_agent = plan_list[idx-1]
+                        formatted_instructions[_previous_agent_key(prev_agent)] = instr_by_agent[prev_agent]
+                    
+                    # Add next agent instructions if available
+                    if idx < len(plan_list) - 1:
+                        next_agent = plan_list[idx+1]
+                        formatted_instructions[_next_agent_key(next_agent)] = instr_by_agent[next_agent]
                 
-                inputs["plan_instructions"] = str(formatted_instructions)
-            logger.log_message(f"Inputs: {inputs}", level=logging.INFO)
-            future = self.executor.submit(self.execute_agent, agent_name, inputs)
-            futures.append((agent_name, inputs, future))
+                inputs["plan_instructions"] = json.dumps(formatted_instructions, ensure_ascii=False, separators=(",", ":"))
+            logger.log_message("Inputs: %s", inputs)
+            task = asyncio.create_task(run_agent(agent_name, inputs))
+            futures.append((agent_name, inputs, task))
         
-        # Yield results as they complete 
-        completed_results = []
-        for agent_name, inputs, future in futures:
-            try:
-                name, result = await asyncio.get_event_loop().run_in_executor(None, future.result)
-                completed_results.append((name, result))
-                yield name, inputs, result
-            except Exception as e:
-                yield agent_name, inputs, {"error": str(e)}
\ No newline at end of file
+        # Yield results as they complete
+        pending = {task: (agent_name, inputs) for agent_name, inputs, task in futures}
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                agent_name, inputs = pending.pop(task)
+                # Finished tasks carry either a result or an exception, the
+                # same split gather(return_exceptions=True) would hand back
+                error = task.exception()
+                if error is None:
+                    name, result = task.result()
+                    yield name, inputs, result
+                else:
+                    yield agent_name, inputs, {"error": str(error)}
+
+# Stateless predictors shared by the routes. Building a module parses the
+# signature, so do it once per process instead of once per request.
+chat_name_predictor = dspy.Predict(chat_history_name_agent)
+dataset_description_predictor = dspy.Predict(dataset_description_agent)
+code_fix_predictor = dspy.ChainOfThought(code_fix)
+code_edit_predictor = dspy.ChainOfThought(code_edit)
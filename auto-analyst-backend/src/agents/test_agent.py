@@ -1,12 +1,19 @@
 import dspy
 import src.agents.memory_agents as m
 import asyncio
+import json
+import orjson
 from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
 import os
-from dotenv import load_dotenv
+import sys
 # import logging
+from src.utils.env import load_env
 from src.utils.logger import Logger
-load_dotenv()
+from src.utils.prompts import minify_signature_prompts
+
+load_env()
 
 logger = Logger("agents", see_time=True, console_log=False)
 
@@ -43,11 +50,14 @@ PLANNER_AGENTS_WITH_DESCRIPTION = {
     ),
 }
 
+# Read-only lookup tables: freeze them and intern the keys
+AGENTS_WITH_DESCRIPTION = MappingProxyType({sys.intern(k): v for k, v in AGENTS_WITH_DESCRIPTION.items()})
+PLANNER_AGENTS_WITH_DESCRIPTION = MappingProxyType({sys.intern(k): v for k, v in PLANNER_AGENTS_WITH_DESCRIPTION.items()})
+
+@lru_cache(maxsize=64)
 def get_agent_description(agent_name, is_planner=False):
-    if is_planner:
-        return PLANNER_AGENTS_WITH_DESCRIPTION[agent_name.lower()] if agent_name.lower() in PLANNER_AGENTS_WITH_DESCRIPTION else "No description available for this agent"
-    else:
-        return AGENTS_WITH_DESCRIPTION[agent_name.lower()] if agent_name.lower() in AGENTS_WITH_DESCRIPTION else "No description available for this agent"
+    descriptions = PLANNER_AGENTS_WITH_DESCRIPTION if is_planner else AGENTS_WITH_DESCRIPTION
+    return descriptions.get(agent_name.lower(), "No description available for this agent")
 
 
 # Agent to make a Chat history name from a query
@@ -232,18 +242,13 @@ class planner_preprocessing_agent(dspy.Signature):
 
     3. **Handle missing values** appropriately (e.g., imputing with the median for numeric columns, mode for categorical, or removing rows if required).
 
-    4. **Convert string-based date columns to datetime** using the provided safe conversion method:
+    4. **Convert string-based date columns to datetime** with a single vectorized call per column (unparseable values become `NaT`):
 
     ```python
-    def safe_to_datetime(date):
-        try:
-            return pd.to_datetime(date, errors='coerce', cache=False)
-        except (ValueError, TypeError):
-            return pd.NaT
-    df_cleaned['datetime_column'] = df_cleaned['datetime_column'].apply(safe_to_datetime)
+    df_cleaned['datetime_column'] = pd.to_datetime(df_cleaned['datetime_column'], errors='coerce', cache=True)
     ```
 
-    Apply this method to any date columns identified in the dataset.
+    Apply this to any date columns identified in the dataset. Do not convert dates row by row with `.apply`.
 
     5. **Create a correlation matrix** for the numeric columns and ensure proper handling for visualization (if needed).
 
@@ -292,24 +297,18 @@ class planner_preprocessing_agent(dspy.Signature):
     numeric_columns = df_cleaned.select_dtypes(include=['number']).columns.tolist()
     categorical_columns = df_cleaned.select_dtypes(include=['object']).columns.tolist()
 
-    # Handle missing values for numeric columns (e.g., fill with median)
-    for col in numeric_columns:
-        df_cleaned[col].fillna(df_cleaned[col].median(), inplace=True)
+    # Handle missing values for numeric columns (fill with median in one call)
+    df_cleaned[numeric_columns] = df_cleaned[numeric_columns].fillna(df_cleaned[numeric_columns].median())
 
-    # Handle missing values for categorical columns (e.g., fill with mode)
-    for col in categorical_columns:
-        df_cleaned[col].fillna(df_cleaned[col].mode()[0], inplace=True)
+    # Handle missing values for categorical columns (fill with mode in one call)
+    modes = df_cleaned[categorical_columns].mode()
+    if not modes.empty:
+        df_cleaned[categorical_columns] = df_cleaned[categorical_columns].fillna(modes.iloc[0])
 
-    # Safe conversion of date columns to datetime
-    def safe_to_datetime(date):
-        try:
-            return pd.to_datetime(date, errors='coerce', cache=False)
-        except (ValueError, TypeError):
-            return pd.NaT
-
-    date_columns = df_cleaned.select_dtypes(include=['object']).columns[df_cleaned.dtypes == 'object'].str.contains('date', case=False)
+    # Vectorized conversion of date columns to datetime (invalid values become NaT)
+    date_columns = [col for col in categorical_columns if 'date' in col.lower()]
     for col in date_columns:
-        df_cleaned[col] = df_cleaned[col].apply(safe_to_datetime)
+        df_cleaned[col] = pd.to_datetime(df_cleaned[col], errors='coerce', cache=True)
 
     # Creating a correlation matrix for numeric columns
     correlation_matrix = df_cleaned[numeric_columns].corr()
@@ -325,7 +324,7 @@ class planner_preprocessing_agent(dspy.Signature):
     **Summary:**
 
     * **Data cleaning**: Missing values were handled for both numeric and categorical columns using median and mode imputation, respectively.
-    * **Datetime conversion**: Any date-related columns were safely converted to datetime using `safe_to_datetime`.
+    * **Datetime conversion**: Any date-related columns were converted to datetime with `pd.to_datetime(..., errors='coerce')`.
     * **Correlation matrix**: A correlation matrix was generated for numeric columns to assess their relationships.
 
 
@@ -664,6 +663,17 @@ class planner_sk_learn_agent(dspy.Signature):
     code = dspy.OutputField(desc="Scikit-learn based machine learning code")
     summary = dspy.OutputField(desc="Explanation of the ML approach and evaluation")
 
+
+# The planner prompts are sent as the system prompt on every call
+minify_signature_prompts(
+    analytical_planner,
+    planner_preprocessing_agent,
+    planner_data_viz_agent,
+    planner_statistical_analytics_agent,
+    planner_sk_learn_agent,
+)
+
+
 class goal_refiner_agent(dspy.Signature):
     # Called to refine the query incase user query not elaborate
     """You take a user-defined goal given to a AI data analyst planner agent, 
@@ -1138,9 +1148,6 @@ class auto_analyst(dspy.Module):
         # Initialize retrievers
         self.dataset = retrievers['dataframe_index'].as_retriever(k=1)
         self.styling_index = retrievers['style_index'].as_retriever(similarity_top_k=1)
-        
-        # Initialize thread pool for parallel execution
-        self.executor = ThreadPoolExecutor(max_workers=min(len(agents) + 2, os.cpu_count() * 2))
 
     def execute_agent(self, agent_name, inputs):
         """Execute a single agent with given inputs"""
@@ -1168,8 +1175,6 @@ class auto_analyst(dspy.Module):
         dict_['styling_index'] = self.styling_index.retrieve(query)[0].text
         dict_['hint'] = []
         dict_['goal'] = query
-        
-        import json
 
         # Clean and split the plan string into agent names
         plan_text = plan.plan.replace("Plan", "").replace(":", "").strip()
@@ -1180,13 +1185,19 @@ class auto_analyst(dspy.Module):
         # logger.log(f"Raw instructions: {raw_instr}")
         if isinstance(raw_instr, str):
             try:
-                plan_instructions = json.loads(raw_instr)
+                plan_instructions = orjson.loads(raw_instr)
             except Exception:
                 plan_instructions = {}
         elif isinstance(raw_instr, dict):
             plan_instructions = raw_instr
         else:
             plan_instructions = {}
+        # Serialize once per plan: reuse the planner's own JSON text when it
+        # parsed cleanly so agents don't each re-render the dict in the prompt
+        if isinstance(raw_instr, str) and plan_instructions:
+            plan_instructions_text = raw_instr
+        else:
+            plan_instructions_text = json.dumps(plan_instructions)
         logger
         # If no plan was produced, short-circuit
         if not plan_list:
@@ -1205,19 +1216,24 @@ class auto_analyst(dspy.Module):
             }
             # attach the specific instructions for this agent (or defaults)
             if "plan_instructions" in self.agent_inputs[key]:
-                inputs['plan_instructions'] = plan_instructions
+                inputs['plan_instructions'] = plan_instructions_text
                 inputs["your_task"] = str(plan_instructions.get(
                     key, ""
                 ))
             # logger.log(f"Inputs: {inputs}")
-            future = self.executor.submit(self.execute_agent, agent_name, inputs)
-            futures.append((agent_name, inputs, future))
-        # Yield results as they complete 
-        completed_results = []
-        for agent_name, inputs, future in futures:
-            try:
-                name, result = await asyncio.get_event_loop().run_in_executor(None, future.result)
-                completed_results.append((name, result))
-                yield name, inputs, result
-            except Exception as e:
-                yield agent_name, inputs, {"error": str(e)}
+            # Agents in a plan don't exchange outputs at run time, so they all
+            # fan out at once; each blocking dspy call gets its own thread
+            task = asyncio.create_task(asyncio.to_thread(self.execute_agent, agent_name, inputs))
+            futures.append((agent_name, inputs, task))
+        # Yield results as they complete
+        pending = {task: (agent_name, inputs) for agent_name, inputs, task in futures}
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                agent_name, inputs = pending.pop(task)
+                error = task.exception()
+                if error is None:
+                    name, result = task.result()
+                    yield name, inputs, result
+                else:
+                    yield agent_name, inputs, {"error": str(error)}
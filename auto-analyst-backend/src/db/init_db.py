@@ -1,13 +1,13 @@
 import logging
 import os
-from dotenv import load_dotenv
+from src.utils.env import load_env
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from src.db.schemas.models import Base
 from src.utils.logger import Logger
 
 logger = Logger("init_db", see_time=True, console_log=True)
-load_dotenv()
+load_env()
 
 # Create the database engine based on environment variable
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///chat_database.db")
@@ -23,7 +23,7 @@ if DATABASE_URL.startswith('postgresql'):
         pool_recycle=300     # Recycle connections after 5 minutes
     )
     is_postgresql = True
-    logger.log_message("Using PostgreSQL database engine", logging.INFO)
+    logger.log_message("Using PostgreSQL database engine", level=logging.INFO)
 else:
     # SQLite configuration
     engine = create_engine(DATABASE_URL)
@@ -34,7 +34,7 @@ else:
         cursor = dbapi_connection.cursor()
         cursor.execute("PRAGMA foreign_keys=ON")
         cursor.close()
-    logger.log_message("Using SQLite database engine", logging.INFO)
+    logger.log_message("Using SQLite database engine", level=logging.INFO)
 
 # Create session factory
 Session = sessionmaker(bind=engine)
@@ -44,8 +44,8 @@ session_factory = Session
 def init_db():
     # Create all tables
     Base.metadata.create_all(engine)
-    logger.log_message("Database and tables created successfully.", logging.INFO)
-    logger.log_message(f"Models: {Base.metadata.tables.keys()}", logging.INFO)
+    logger.log_message("Database and tables created successfully.", level=logging.INFO)
+    logger.log_message(f"Models: {Base.metadata.tables.keys()}", level=logging.INFO)
 
 # Utility function to get a new session
 def get_session():
@@ -56,7 +56,7 @@ def get_db():
     try:
         yield db
     except Exception as e:
-        logger.log_message(f"Error getting database session: {e}", logging.ERROR)
+        logger.log_message(f"Error getting database session: {e}", level=logging.ERROR)
     finally:
         db.close()
 
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, Text, Float, Boolean
+from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, Text, Float, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -11,8 +11,8 @@ class User(Base):
     __tablename__ = 'users'
     
     user_id = Column(Integer, primary_key=True, autoincrement=True)
-    username = Column(String, unique=True, nullable=False)
-    email = Column(String, unique=True, nullable=False)
+    username = Column(String(255), unique=True, nullable=False)
+    email = Column(String(255), unique=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     # Add relationship for cascade options
     chats = relationship("Chat", back_populates="user", cascade="all, delete-orphan")
@@ -24,7 +24,7 @@ class Chat(Base):
     
     chat_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.user_id', ondelete="CASCADE"), nullable=True)
-    title = Column(String, default='New Chat')
+    title = Column(String(255), default='New Chat')  # chat_manager caps titles at 255
     created_at = Column(DateTime, default=datetime.utcnow)
     # Add relationships for cascade options
     user = relationship("User", back_populates="chats")
@@ -37,7 +37,7 @@ class Message(Base):
     
     message_id = Column(Integer, primary_key=True, autoincrement=True)
     chat_id = Column(Integer, ForeignKey('chats.chat_id', ondelete="CASCADE"), nullable=False)
-    sender = Column(String, nullable=False)  # 'user' or 'ai'
+    sender = Column(String(16), nullable=False)  # 'user' or 'ai'
     content = Column(Text, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
     # Add relationship for cascade options
@@ -47,11 +47,17 @@ class Message(Base):
 class ModelUsage(Base):
     """Tracks AI model usage metrics for analytics and billing purposes."""
     __tablename__ = 'model_usage'
+    # Analytics filter usage by user or chat over a time range; the leading
+    # column also serves plain user_id/chat_id lookups
+    __table_args__ = (
+        Index('ix_model_usage_user_timestamp', 'user_id', 'timestamp'),
+        Index('ix_model_usage_chat_timestamp', 'chat_id', 'timestamp'),
+    )
     
     usage_id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.user_id', ondelete="SET NULL"), nullable=True)
     chat_id = Column(Integer, ForeignKey('chats.chat_id', ondelete="SET NULL"), nullable=True)
-    model_name = Column(String(100), nullable=False)
+    model_name = Column(String(100), nullable=False, index=True)
     provider = Column(String(50), nullable=False)
     prompt_tokens = Column(Integer, default=0)
     completion_tokens = Column(Integer, default=0)
@@ -59,7 +65,7 @@ class ModelUsage(Base):
     query_size = Column(Integer, default=0)  # Size in characters
     response_size = Column(Integer, default=0)  # Size in characters
     cost = Column(Float, default=0.0)  # Cost in USD
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     is_streaming = Column(Boolean, default=False)
     request_time_ms = Column(Integer, default=0)  # Request processing time in milliseconds
     # Add relationships
@@ -4,7 +4,7 @@ import time
 from src.db.schemas.models import ModelUsage
 from src.db.init_db import session_factory
 from datetime import datetime
-import tiktoken
+from functools import lru_cache
 from src.routes.analytics_routes import handle_new_model_usage
 import asyncio
 
@@ -13,6 +13,57 @@ from src.utils.model_registry import get_provider_for_model, calculate_cost
 
 logger = Logger(name="ai_manager", see_time=True, console_log=True)
 
+# Saved usage rows are broadcast to the analytics dashboards by a single
+# consumer task. The queue is bounded so a burst of requests can't pile up
+# broadcast work; updates past the limit are dropped and logged
+USAGE_BROADCAST_QUEUE_SIZE = 1000
+_usage_broadcast_queue = None
+_usage_broadcast_loop = None
+
+async def _broadcast_usage_events():
+    while True:
+        usage = await _usage_broadcast_queue.get()
+        try:
+            await handle_new_model_usage(usage)
+        except Exception as e:
+            logger.log_message(f"Error broadcasting usage for chat {usage.chat_id}: {str(e)}", level=logging.ERROR)
+        finally:
+            _usage_broadcast_queue.task_done()
+
+def _put_usage_event(usage):
+    try:
+        _usage_broadcast_queue.put_nowait(usage)
+    except asyncio.QueueFull:
+        logger.log_message(f"Usage broadcast queue full, dropping update for chat {usage.chat_id}", level=logging.WARNING)
+
+def queue_usage_broadcast(usage):
+    """Queue a saved ModelUsage row for broadcast; safe to call from worker threads"""
+    global _usage_broadcast_queue, _usage_broadcast_loop
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    
+    # The consumer is started lazily on the first call made from the event loop
+    if _usage_broadcast_loop is None or _usage_broadcast_loop.is_closed():
+        if running_loop is None:
+            logger.log_message(f"No event loop running, skipping usage broadcast for chat {usage.chat_id}", level=logging.WARNING)
+            return
+        _usage_broadcast_queue = asyncio.Queue(maxsize=USAGE_BROADCAST_QUEUE_SIZE)
+        _usage_broadcast_loop = running_loop
+        running_loop.create_task(_broadcast_usage_events())
+    
+    if running_loop is _usage_broadcast_loop:
+        _put_usage_event(usage)
+    else:
+        _usage_broadcast_loop.call_soon_threadsafe(_put_usage_event, usage)
+
+@lru_cache(maxsize=4)
+def _get_encoding(name):
+    """Loading a BPE vocabulary is slow, so every AI_Manager shares one encoding"""
+    import tiktoken
+    return tiktoken.get_encoding(name)
+
 class AI_Manager:
     """Manages AI model interactions and usage tracking"""
     
@@ -20,8 +71,7 @@ class AI_Manager:
         self.tokenizer = None
         # Initialize tokenizer - could use tiktoken or another tokenizer
         try:
-            import tiktoken
-            self.tokenizer = tiktoken.get_encoding("cl100k_base")
+            self.tokenizer = _get_encoding("cl100k_base")
         except ImportError:
             logger.log_message("Tiktoken not available, using simple tokenizer", level=logging.WARNING)
             self.tokenizer = SimpleTokenizer()
@@ -31,35 +81,42 @@ class AI_Manager:
                        query_size, response_size, cost, request_time_ms, 
                        is_streaming=False):
         """Save model usage data to the database"""
+        self.save_usage_records_to_db([{
+            "user_id": user_id,
+            "chat_id": chat_id,
+            "model_name": model_name,
+            "provider": provider,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": total_tokens,
+            "query_size": query_size,
+            "response_size": response_size,
+            "cost": cost,
+            "request_time_ms": request_time_ms,
+            "is_streaming": is_streaming,
+        }])
+    
+    def save_usage_records_to_db(self, records):
+        """Save a batch of usage records (save_usage_to_db keyword dicts) in one transaction"""
+        if not records:
+            return
+        
+        session = session_factory()
         try:
-            session = session_factory()
-            
-            usage = ModelUsage(
-                user_id=user_id,
-                chat_id=chat_id,
-                model_name=model_name,
-                provider=provider,
-                prompt_tokens=prompt_tokens,
-                completion_tokens=completion_tokens,
-                total_tokens=total_tokens,
-                query_size=query_size,
-                response_size=response_size,
-                cost=cost,
-                timestamp=datetime.utcnow(),
-                is_streaming=is_streaming,
-                request_time_ms=request_time_ms
-            )
+            timestamp = datetime.utcnow()
+            usages = [ModelUsage(timestamp=timestamp, **record) for record in records]
             
-            session.add(usage)
+            session.add_all(usages)
             session.commit()
-            # logger.info(f"Saved usage data to database for chat {chat_id}: {total_tokens} tokens, ${cost:.6f}")
             
-            # Broadcast the event asynchronously
-            asyncio.create_task(handle_new_model_usage(usage))
+            # Broadcast the events asynchronously
+            for usage in usages:
+                queue_usage_broadcast(usage)
             
         except Exception as e:
             session.rollback()
-            logger.log_message(f"Error saving usage data to database for chat {chat_id}: {str(e)}", level=logging.ERROR)
+            chat_ids = sorted({str(record.get("chat_id")) for record in records})
+            logger.log_message(f"Error saving usage data to database for chat {', '.join(chat_ids)}: {str(e)}", level=logging.ERROR)
         finally:
             session.close()
         
@@ -12,9 +12,9 @@ from src.managers.user_manager import create_user, get_current_user
 from src.agents.agents import auto_analyst, auto_analyst_ind
 from src.agents.retrievers.retrievers import make_data
 from src.managers.chat_manager import ChatManager
-from dotenv import load_dotenv
+from src.utils.env import load_env
 
-load_dotenv()
+load_env()
 
 # Initialize logger
 logger = Logger("session_manager", see_time=False, console_log=False)
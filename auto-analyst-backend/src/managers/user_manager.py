@@ -102,7 +102,7 @@ def create_user(username: str, email: str) -> User:
     
     except Exception as e:
         session.rollback()
-        logger.log_message(f"Error creating user: {str(e)}", logging.ERROR)
+        logger.log_message(f"Error creating user: {str(e)}", level=logging.ERROR)
         raise
     
     finally:
@@ -119,5 +119,5 @@ def get_user_by_email(email: str) -> Optional[User]:
             email=user.email
         )
     except Exception as e:
-        logger.log_message(f"Error getting user by email: {str(e)}", logging.ERROR)
+        logger.log_message(f"Error getting user by email: {str(e)}", level=logging.ERROR)
         return None
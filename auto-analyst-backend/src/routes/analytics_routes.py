@@ -44,14 +44,14 @@ async def verify_admin_api_key(
 ):
     # Check header first
     if api_key and api_key == ADMIN_API_KEY:
-        logger.log_message("Admin API key successfully verified via header", logging.INFO)
+        logger.log_message("Admin API key successfully verified via header", level=logging.INFO)
         return True
         
     # If API key wasn't in header or didn't match, check query parameters
     if request:
         api_key_query = request.query_params.get("admin_api_key")
         if api_key_query and api_key_query == ADMIN_API_KEY:
-            logger.log_message("Admin API key successfully verified via query parameter", logging.INFO)
+            logger.log_message("Admin API key successfully verified via query parameter", level=logging.INFO)
             return True
     
     # If we got here, the API key is invalid
@@ -91,7 +91,7 @@ async def get_dashboard_data(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message(f"Dashboard data requested for period: {period}", logging.INFO)
+    logger.log_message(f"Dashboard data requested for period: {period}", level=logging.INFO)
     start_date, end_date = get_date_range(period)
     
     # Get total stats
@@ -189,14 +189,14 @@ async def get_dashboard_data(
         "start_date": start_date.strftime('%Y-%m-%d'),
         "end_date": end_date.strftime('%Y-%m-%d'),
     }
-    logger.log_message(f"Dashboard data retrieved: {len(daily_usage)} days, {len(model_usage)} models, {len(top_users)} top users", logging.INFO)
+    logger.log_message(f"Dashboard data retrieved: {len(daily_usage)} days, {len(model_usage)} models, {len(top_users)} top users", level=logging.INFO)
     return result
 
 # WebSocket endpoint for real-time dashboard updates
 @router.websocket("/dashboard/realtime")
 async def dashboard_realtime(websocket: WebSocket):
     client_id = id(websocket)
-    logger.log_message(f"New dashboard realtime connection: {client_id}", logging.INFO)
+    logger.log_message(f"New dashboard realtime connection: {client_id}", level=logging.INFO)
     await websocket.accept()
     active_dashboard_connections.add(websocket)
     
@@ -206,7 +206,7 @@ async def dashboard_realtime(websocket: WebSocket):
             await websocket.receive_text()
     except Exception as e:
         # Remove connection when client disconnects
-        logger.log_message(f"Dashboard realtime connection closed: {client_id}, reason: {str(e)}", logging.INFO)
+        logger.log_message(f"Dashboard realtime connection closed: {client_id}, reason: {str(e)}", level=logging.INFO)
         active_dashboard_connections.remove(websocket)
         await websocket.close()
 
@@ -218,7 +218,7 @@ async def get_users(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message(f"User analytics requested with limit: {limit}, offset: {offset}", logging.INFO)
+    logger.log_message(f"User analytics requested with limit: {limit}, offset: {offset}", level=logging.INFO)
     user_query = db.query(
         ModelUsage.user_id,
         func.sum(ModelUsage.total_tokens).label("tokens"),
@@ -251,7 +251,7 @@ async def get_users(
         .filter(ModelUsage.user_id.isnot(None))\
         .scalar() or 0
     
-    logger.log_message(f"Retrieved {len(users)} users, total users: {total_users}", logging.INFO)
+    logger.log_message(f"Retrieved {len(users)} users, total users: {total_users}", level=logging.INFO)
     return {
         "users": users,
         "total": total_users,
@@ -265,7 +265,7 @@ async def get_user_activity(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message(f"User activity requested for period: {period}", logging.INFO)
+    logger.log_message(f"User activity requested for period: {period}", level=logging.INFO)
     start_date, end_date = get_date_range(period)
     
     # First, get a subquery for the first date each user was seen
@@ -328,7 +328,7 @@ async def get_user_activity(
                 "sessions": 0
             })
     
-    logger.log_message(f"Retrieved user activity data for {len(filled_activity)} days", logging.INFO)
+    logger.log_message(f"Retrieved user activity data for {len(filled_activity)} days", level=logging.INFO)
     return {"user_activity": filled_activity}
 
 @router.get("/users/sessions/stats")
@@ -336,7 +336,7 @@ async def get_session_stats(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message("Session statistics requested", logging.INFO)
+    logger.log_message("Session statistics requested", level=logging.INFO)
     # Total users ever
     total_users = db.query(func.count(func.distinct(ModelUsage.user_id)))\
         .filter(ModelUsage.user_id.isnot(None))\
@@ -389,7 +389,7 @@ async def get_session_stats(
     
     avg_session_time = int(total_seconds / session_count) if session_count > 0 else 0
     
-    logger.log_message(f"Session stats retrieved: {total_users} total users, {active_today} active today", logging.INFO)
+    logger.log_message(f"Session stats retrieved: {total_users} total users, {active_today} active today", level=logging.INFO)
     return {
         "totalUsers": total_users,
         "activeToday": active_today,
@@ -400,7 +400,7 @@ async def get_session_stats(
 @router.websocket("/realtime")
 async def user_realtime(websocket: WebSocket):
     client_id = id(websocket)
-    logger.log_message(f"New user realtime connection: {client_id}", logging.INFO)
+    logger.log_message(f"New user realtime connection: {client_id}", level=logging.INFO)
     await websocket.accept()
     active_user_connections.add(websocket)
     
@@ -409,7 +409,7 @@ async def user_realtime(websocket: WebSocket):
             # Keep connection alive
             await websocket.receive_text()
     except Exception as e:
-        logger.log_message(f"User realtime connection closed: {client_id}, reason: {str(e)}", logging.INFO)
+        logger.log_message(f"User realtime connection closed: {client_id}, reason: {str(e)}", level=logging.INFO)
         active_user_connections.remove(websocket)
         await websocket.close()
 
@@ -420,7 +420,7 @@ async def get_model_usage(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message(f"Model usage requested for period: {period}", logging.INFO)
+    logger.log_message(f"Model usage requested for period: {period}", level=logging.INFO)
     start_date, end_date = get_date_range(period)
     
     # Get model usage breakdown
@@ -450,7 +450,7 @@ async def get_model_usage(
         for model in model_query
     ]
     
-    logger.log_message(f"Retrieved model usage for {len(model_usage)} models", logging.INFO)
+    logger.log_message(f"Retrieved model usage for {len(model_usage)} models", level=logging.INFO)
     return {"model_usage": model_usage}
 
 @router.get("/models/history")
@@ -459,7 +459,7 @@ async def get_model_history(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message(f"Model history requested for period: {period}", logging.INFO)
+    logger.log_message(f"Model history requested for period: {period}", level=logging.INFO)
     start_date, end_date = get_date_range(period)
     
     # Get daily usage per model
@@ -516,7 +516,7 @@ async def get_model_history(
                 "models": [{"name": model_name, "tokens": 0, "requests": 0} for model_name in model_names]
             })
     
-    logger.log_message(f"Retrieved model history for {len(model_history)} days covering {len(model_names)} models", logging.INFO)
+    logger.log_message(f"Retrieved model history for {len(model_history)} days covering {len(model_names)} models", level=logging.INFO)
     return {"model_history": model_history}
 
 @router.get("/models/metrics")
@@ -524,7 +524,7 @@ async def get_model_metrics(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message("Model metrics requested", logging.INFO)
+    logger.log_message("Model metrics requested", level=logging.INFO)
     # Calculate performance metrics for each model
     metrics_query = db.query(
         ModelUsage.model_name.label("name"),
@@ -548,7 +548,7 @@ async def get_model_metrics(
         for metrics in metrics_query.all()  # Fetch all results to avoid lazy loading!!!
     ]
     
-    logger.log_message(f"Retrieved metrics for {len(model_metrics)} models", logging.INFO)
+    logger.log_message(f"Retrieved metrics for {len(model_metrics)} models", level=logging.INFO)
     return {"model_metrics": model_metrics}
 
 # Cost analytics endpoints
@@ -558,7 +558,7 @@ async def get_cost_summary(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message(f"Cost summary requested for period: {period}", logging.INFO)
+    logger.log_message(f"Cost summary requested for period: {period}", level=logging.INFO)
     start_date, end_date = get_date_range(period)
     
     # Get cost summary
@@ -584,7 +584,7 @@ async def get_cost_summary(
         "startDate": start_date.strftime('%Y-%m-%d'),
         "endDate": end_date.strftime('%Y-%m-%d')
     }
-    logger.log_message(f"Cost summary retrieved: ${result['totalCost']:.2f} over {days} days", logging.INFO)
+    logger.log_message(f"Cost summary retrieved: ${result['totalCost']:.2f} over {days} days", level=logging.INFO)
     return result
 
 @router.get("/costs/daily")
@@ -593,7 +593,7 @@ async def get_daily_costs(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message(f"Daily costs requested for period: {period}", logging.INFO)
+    logger.log_message(f"Daily costs requested for period: {period}", level=logging.INFO)
     start_date, end_date = get_date_range(period)
     
     # Get daily costs
@@ -636,7 +636,7 @@ async def get_daily_costs(
                 "tokens": 0
             })
     
-    logger.log_message(f"Retrieved daily costs for {len(filled_costs)} days", logging.INFO)
+    logger.log_message(f"Retrieved daily costs for {len(filled_costs)} days", level=logging.INFO)
     return {"daily_costs": filled_costs}
 
 @router.get("/costs/models")
@@ -645,7 +645,7 @@ async def get_model_costs(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message(f"Model costs requested for period: {period}", logging.INFO)
+    logger.log_message(f"Model costs requested for period: {period}", level=logging.INFO)
     start_date, end_date = get_date_range(period)
     
     # Get costs by model
@@ -673,7 +673,7 @@ async def get_model_costs(
         for model in model_query
     ]
     
-    logger.log_message(f"Retrieved cost data for {len(model_costs)} models", logging.INFO)
+    logger.log_message(f"Retrieved cost data for {len(model_costs)} models", level=logging.INFO)
     return {"model_costs": model_costs}
 
 @router.get("/costs/projections")
@@ -681,7 +681,7 @@ async def get_cost_projections(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message("Cost projections requested", logging.INFO)
+    logger.log_message("Cost projections requested", level=logging.INFO)
     # Get last 30 days usage as baseline
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
     
@@ -711,7 +711,7 @@ async def get_cost_projections(
         "dailyTokens": daily_tokens,
         "baselineDays": actual_days
     }
-    logger.log_message(f"Cost projections calculated: ${result['nextMonth']:.2f}/month, ${result['nextYear']:.2f}/year", logging.INFO)
+    logger.log_message(f"Cost projections calculated: ${result['nextMonth']:.2f}/month, ${result['nextYear']:.2f}/year", level=logging.INFO)
     return result
 
 @router.get("/costs/today")
@@ -719,7 +719,7 @@ async def get_today_costs(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message("Today's costs requested", logging.INFO)
+    logger.log_message("Today's costs requested", level=logging.INFO)
     today = datetime.utcnow().date()
     
     # Get today's costs
@@ -737,13 +737,13 @@ async def get_today_costs(
         "tokens": int(today_data.tokens or 0),
         "requests": int(today_data.requests or 0)
     }
-    logger.log_message(f"Today's costs retrieved: ${result['cost']:.2f}, {result['tokens']} tokens", logging.INFO)
+    logger.log_message(f"Today's costs retrieved: ${result['cost']:.2f}, {result['tokens']} tokens", level=logging.INFO)
     return result
 
 # Debug endpoint for testing admin key
 @router.get("/debug/model_usage")
 async def debug_model_usage(api_key: str = Depends(verify_admin_api_key)):
-    logger.log_message("Debug model usage endpoint accessed", logging.INFO)
+    logger.log_message("Debug model usage endpoint accessed", level=logging.INFO)
     return {"status": "success", "message": "Admin API key validated successfully"}
 
 # Function to broadcast real-time updates to all connected dashboard clients
@@ -752,13 +752,13 @@ async def broadcast_dashboard_update(update_data: Dict[str, Any]):
         return
     
     connection_count = len(active_dashboard_connections)
-    logger.log_message(f"Broadcasting dashboard update to {connection_count} connections", logging.INFO)
+    logger.log_message(f"Broadcasting dashboard update to {connection_count} connections", level=logging.INFO)
     
     for connection in active_dashboard_connections.copy():
         try:
             await connection.send_text(json.dumps(update_data))
         except Exception as e:
-            logger.log_message(f"Failed to send dashboard update: {str(e)}", logging.WARNING)
+            logger.log_message(f"Failed to send dashboard update: {str(e)}", level=logging.WARNING)
             active_dashboard_connections.remove(connection)
 
 # Function to broadcast real-time updates to all connected user analytics clients
@@ -767,13 +767,13 @@ async def broadcast_user_update(update_data: Dict[str, Any]):
         return
     
     connection_count = len(active_user_connections)
-    logger.log_message(f"Broadcasting user update to {connection_count} connections", logging.INFO)
+    logger.log_message(f"Broadcasting user update to {connection_count} connections", level=logging.INFO)
     
     for connection in active_user_connections.copy():
         try:
             await connection.send_text(json.dumps(update_data))
         except Exception as e:
-            logger.log_message(f"Failed to send user update: {str(e)}", logging.WARNING)
+            logger.log_message(f"Failed to send user update: {str(e)}", level=logging.WARNING)
             active_user_connections.remove(connection)
 
 # Usage summary endpoint (to maintain backward compatibility)
@@ -782,7 +782,7 @@ async def get_usage_summary(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message("Usage summary requested (legacy endpoint)", logging.INFO)
+    logger.log_message("Usage summary requested (legacy endpoint)", level=logging.INFO)
     # Call the dashboard endpoint with default period
     return await get_dashboard_data(period="30d", db=db, api_key=api_key)
 
@@ -840,9 +840,9 @@ async def handle_new_model_usage(model_usage: ModelUsage):
         # Broadcast updates
         await broadcast_dashboard_update(dashboard_update)
         await broadcast_dashboard_update(model_update)
-        logger.log_message("Model usage updates broadcasted successfully", logging.INFO)
+        logger.log_message("Model usage updates broadcasted successfully", level=logging.INFO)
     except Exception as e:
-        logger.log_message(f"Error processing model usage event: {str(e)}", logging.ERROR)
+        logger.log_message(f"Error processing model usage event: {str(e)}", level=logging.ERROR)
     finally:
         session.close()  # Ensure the session is closed after use
 
@@ -852,7 +852,7 @@ async def get_tier_usage(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message(f"Tier usage requested for period: {period}", logging.INFO)
+    logger.log_message(f"Tier usage requested for period: {period}", level=logging.INFO)
     start_date, end_date = get_date_range(period)
     
     # Get all model usage during the period
@@ -919,7 +919,7 @@ async def get_tier_usage(
         else:
             data["cost_per_credit"] = 0
     
-    logger.log_message(f"Retrieved tier usage data for {len(tier_data)} tiers", logging.INFO)
+    logger.log_message(f"Retrieved tier usage data for {len(tier_data)} tiers", level=logging.INFO)
     return {
         "tier_data": tier_data,
         "period": period,
@@ -932,7 +932,7 @@ async def get_tier_projections(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message("Tier projections requested", logging.INFO)
+    logger.log_message("Tier projections requested", level=logging.INFO)
     # Get last 30 days usage for baseline
     tier_usage = await get_tier_usage(period="30d", db=db, api_key=api_key)
     tier_data = tier_usage["tier_data"]
@@ -996,7 +996,7 @@ async def get_tier_projections(
         for metric in ["requests", "tokens", "cost", "credits"]:
             projections[period][f"total_{metric}"] = sum(projections[period][metric].values())
     
-    logger.log_message(f"Tier projections calculated for {len(daily_tier_usage)} tiers", logging.INFO)
+    logger.log_message(f"Tier projections calculated for {len(daily_tier_usage)} tiers", level=logging.INFO)
     return {
         "daily_usage": daily_tier_usage,
         "projections": projections,
@@ -1009,7 +1009,7 @@ async def get_tier_efficiency(
     db: Session = Depends(get_db),
     api_key: str = Depends(verify_admin_api_key)
 ):
-    logger.log_message(f"Tier efficiency requested for period: {period}", logging.INFO)
+    logger.log_message(f"Tier efficiency requested for period: {period}", level=logging.INFO)
     # Get tier usage data
     tier_usage = await get_tier_usage(period=period, db=db, api_key=api_key)
     tier_data = tier_usage["tier_data"]
@@ -1047,7 +1047,7 @@ async def get_tier_efficiency(
         default=(None, {})
     )[0]
     
-    logger.log_message(f"Tier efficiency calculated for {len(efficiency_data)} tiers", logging.INFO)
+    logger.log_message(f"Tier efficiency calculated for {len(efficiency_data)} tiers", level=logging.INFO)
     return {
         "efficiency_data": efficiency_data,
         "most_efficient_tier": most_efficient_tier,
@@ -1,13 +1,21 @@
-import json
+import hashlib
 import os
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from functools import lru_cache
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Query
+import numpy as np
+# orjson parses the data files and renders responses several times faster
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 
 # Create router
 router = APIRouter(
     prefix="/api",
     tags=["automotive"],
     responses={404: {"description": "Not found"}},
+    default_response_class=ORJSONResponse,
 )
 
 # Path to the data files
@@ -21,19 +29,205 @@ if not os.path.exists(vehicles_file) or not os.path.exists(market_data_file):
         "Automotive data files not found. Please run the script 'scripts/generate_automotive_data.py' first."
     )
 
+# Equality filters are answered from per-field indexes instead of row scans
+VEHICLE_INDEX_FIELDS = ("make", "model", "year", "condition", "is_sold")
+MARKET_DATA_INDEX_FIELDS = ("make", "model", "year", "is_opportunity")
+
+def _index_key(value):
+    # String filters are case-insensitive; casefold also matches forms like "ß" and "SS"
+    return value.casefold() if isinstance(value, str) else value
+
+def _build_index(rows, fields):
+    """Map each field's normalized values to the positions of matching rows"""
+    index = {field: defaultdict(list) for field in fields}
+    for position, row in enumerate(rows):
+        for field in fields:
+            index[field][_index_key(row[field])].append(position)
+    return {field: dict(buckets) for field, buckets in index.items()}
+
+def _first_by(rows, field):
+    """Map each value of field to the first row holding it"""
+    lookup = {}
+    for row in rows:
+        lookup.setdefault(row[field], row)
+    return lookup
+
+def _build_opportunities(market_data, vehicles_by_id):
+    """Merge each market row into its vehicle, sorted by percent difference (highest first)"""
+    opportunities = [
+        {**vehicles_by_id[data["vehicle_id"]], "market_data": data}
+        for data in market_data
+        if data["vehicle_id"] in vehicles_by_id
+    ]
+    # Stable sort, so rows with equal differences keep their file order
+    opportunities.sort(key=lambda o: o["market_data"]["percent_difference"], reverse=True)
+    # Ascending negated keys let bisect find the cutoff for a minimum difference
+    sort_keys = [-o["market_data"]["percent_difference"] for o in opportunities]
+    return opportunities, sort_keys
+
+def _build_statistics(vehicles, market_data):
+    """Inventory overview served by /statistics"""
+    # Counters keep first-seen order, matching the order makes appear in the file
+    make_counts = Counter(v["make"] for v in vehicles)
+    condition_counts = Counter(v["condition"] for v in vehicles)
+    
+    price_totals = defaultdict(int)
+    for vehicle in vehicles:
+        price_totals[vehicle["make"]] += vehicle["price"]
+    
+    sold_vehicles = sum(1 for v in vehicles if v["is_sold"])
+    
+    return {
+        "total_vehicles": len(vehicles),
+        "available_vehicles": len(vehicles) - sold_vehicles,
+        "sold_vehicles": sold_vehicles,
+        "make_distribution": dict(make_counts),
+        "condition_distribution": dict(condition_counts),
+        "avg_prices_by_make": {make: total / make_counts[make] for make, total in price_totals.items()},
+        "opportunities_count": sum(1 for d in market_data if d["is_opportunity"]),
+    }
+
+def _match_positions(index, filters, size):
+    """Positions of the rows matching every (field, value) filter, in file order"""
+    positions = None
+    for field, value in filters:
+        bucket = index[field].get(_index_key(value), ())
+        positions = set(bucket) if positions is None else positions.intersection(bucket)
+    return range(size) if positions is None else sorted(positions)
+
 # Load data from files
+def data_version():
+    """Modification times of the data files; changes whenever they are regenerated"""
+    return os.path.getmtime(vehicles_file), os.path.getmtime(market_data_file)
+
+def load_dataset(version=None):
+    """Return the parsed data files and their indexes, rebuilt only after the files change"""
+    return _load_dataset(*(version or data_version()))
+
 def load_data():
-    with open(vehicles_file, "r") as f:
-        vehicles = json.load(f)
+    dataset = load_dataset()
+    return dataset["vehicles"], dataset["market_data"]
+
+@lru_cache(maxsize=1)
+def _load_dataset(vehicles_mtime, market_data_mtime):
+    # Keyed on the file mtimes, so regenerating the data invalidates the cache.
+    # Everything returned is shared across requests and must not be mutated
+    with open(vehicles_file, "rb") as f:
+        vehicles = orjson.loads(f.read())
+    
+    with open(market_data_file, "rb") as f:
+        market_data = orjson.loads(f.read())
+    
+    vehicles_by_id = _first_by(vehicles, "id")
+    opportunities, opportunity_keys = _build_opportunities(market_data, vehicles_by_id)
+    
+    return {
+        "vehicles": vehicles,
+        "market_data": market_data,
+        "vehicle_index": _build_index(vehicles, VEHICLE_INDEX_FIELDS),
+        "vehicle_prices": np.array([v["price"] for v in vehicles]),
+        "market_data_index": _build_index(market_data, MARKET_DATA_INDEX_FIELDS),
+        "vehicles_by_id": vehicles_by_id,
+        "market_data_by_vehicle_id": _first_by(market_data, "vehicle_id"),
+        "opportunities": opportunities,
+        "opportunity_keys": opportunity_keys,
+        "statistics": _build_statistics(vehicles, market_data),
+    }
+
+def _not_modified(request: Request, response: Response, version):
+    """Tag the response with an ETag for this data version and query.
+
+    Returns a 304 response when the client's If-None-Match already holds it.
+    """
+    key = f"{version}:{request.url.path}:{sorted(request.query_params.multi_items())}"
+    etag = '"' + hashlib.blake2b(key.encode(), digest_size=8).hexdigest() + '"'
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+def _json_body(response: Response, body: bytes):
+    """Send an already serialized JSON body with the ETag set on response"""
+    return Response(content=body, media_type="application/json", headers={"ETag": response.headers["ETag"]})
+
+# Dashboards repeat a handful of filter combinations, so the serialized
+# pages are cached. The data version is part of the key, so pages from
+# before a data reload are never served and age out of the LRU
+@lru_cache(maxsize=256)
+def _vehicles_page(version, make, model, year, min_price, max_price, condition, sold, limit, offset):
+    dataset = load_dataset(version)
+    vehicles = dataset["vehicles"]
+    
+    # Apply equality filters through the indexes
+    filters = []
+    if make:
+        filters.append(("make", make))
+    if model:
+        filters.append(("model", model))
+    if year:
+        filters.append(("year", year))
+    if condition:
+        filters.append(("condition", condition))
+    if sold is not None:
+        filters.append(("is_sold", sold))
+    
+    positions = _match_positions(dataset["vehicle_index"], filters, len(vehicles))
+    
+    # Apply the price bounds as a vectorized mask over the price column
+    if min_price is not None or max_price is not None:
+        positions = np.asarray(positions, dtype=np.intp)
+        prices = dataset["vehicle_prices"][positions]
+        mask = np.ones(len(positions), dtype=bool)
+        if min_price is not None:
+            mask &= prices >= min_price
+        if max_price is not None:
+            mask &= prices <= max_price
+        positions = positions[mask]
+    
+    # Apply pagination, materializing only the rows on the page
+    total_count = len(positions)
+    paginated_vehicles = [vehicles[i] for i in positions[offset:offset + limit]]
+    
+    return orjson.dumps({
+        "total": total_count,
+        "vehicles": paginated_vehicles
+    })
+
+@lru_cache(maxsize=256)
+def _market_data_page(version, make, model, year, is_opportunity, limit, offset):
+    dataset = load_dataset(version)
+    market_data = dataset["market_data"]
     
-    with open(market_data_file, "r") as f:
-        market_data = json.load(f)
+    # Apply filters through the indexes
+    filters = []
+    if make:
+        filters.append(("make", make))
+    if model:
+        filters.append(("model", model))
+    if year:
+        filters.append(("year", year))
+    if is_opportunity is not None:
+        filters.append(("is_opportunity", is_opportunity))
+    
+    positions = _match_positions(dataset["market_data_index"], filters, len(market_data))
     
-    return vehicles, market_data
+    # Apply pagination, materializing only the rows on the page
+    total_count = len(positions)
+    paginated_data = [market_data[i] for i in positions[offset:offset + limit]]
+    
+    return orjson.dumps({
+        "total": total_count,
+        "market_data": paginated_data
+    })
 
 # Routes
 @router.get("/vehicles")
 async def get_vehicles(
+    request: Request,
+    response: Response,
     make: Optional[str] = None,
     model: Optional[str] = None,
     year: Optional[int] = None,
@@ -47,56 +241,41 @@ async def get_vehicles(
     """
     Get vehicle inventory with optional filters
     """
-    vehicles, _ = load_data()
-    
-    # Apply filters
-    filtered_vehicles = vehicles
-    
-    if make:
-        filtered_vehicles = [v for v in filtered_vehicles if v["make"].lower() == make.lower()]
-    
-    if model:
-        filtered_vehicles = [v for v in filtered_vehicles if v["model"].lower() == model.lower()]
-    
-    if year:
-        filtered_vehicles = [v for v in filtered_vehicles if v["year"] == year]
-    
-    if min_price is not None:
-        filtered_vehicles = [v for v in filtered_vehicles if v["price"] >= min_price]
-    
-    if max_price is not None:
-        filtered_vehicles = [v for v in filtered_vehicles if v["price"] <= max_price]
-    
-    if condition:
-        filtered_vehicles = [v for v in filtered_vehicles if v["condition"].lower() == condition.lower()]
-    
-    if sold is not None:
-        filtered_vehicles = [v for v in filtered_vehicles if v["is_sold"] == sold]
-    
-    # Apply pagination
-    total_count = len(filtered_vehicles)
-    paginated_vehicles = filtered_vehicles[offset:offset + limit]
-    
-    return {
-        "total": total_count,
-        "vehicles": paginated_vehicles
-    }
+    version = data_version()
+    not_modified = _not_modified(request, response, version)
+    if not_modified is not None:
+        return not_modified
+    
+    # Normalize the filters so equivalent queries share a cache entry
+    body = _vehicles_page(
+        version,
+        _index_key(make) or None,
+        _index_key(model) or None,
+        year or None,
+        min_price,
+        max_price,
+        _index_key(condition) or None,
+        sold,
+        limit,
+        offset,
+    )
+    return _json_body(response, body)
 
 @router.get("/vehicles/{vehicle_id}")
 async def get_vehicle(vehicle_id: int):
     """
     Get a specific vehicle by ID
     """
-    vehicles, _ = load_data()
-    
-    for vehicle in vehicles:
-        if vehicle["id"] == vehicle_id:
-            return vehicle
+    vehicle = load_dataset()["vehicles_by_id"].get(vehicle_id)
+    if vehicle is not None:
+        return vehicle
     
     raise HTTPException(status_code=404, detail=f"Vehicle with ID {vehicle_id} not found")
 
 @router.get("/market-data")
 async def get_market_data(
+    request: Request,
+    response: Response,
     make: Optional[str] = None,
     model: Optional[str] = None,
     year: Optional[int] = None,
@@ -107,75 +286,57 @@ async def get_market_data(
     """
     Get market data with optional filters
     """
-    _, market_data = load_data()
-    
-    # Apply filters
-    filtered_data = market_data
-    
-    if make:
-        filtered_data = [d for d in filtered_data if d["make"].lower() == make.lower()]
-    
-    if model:
-        filtered_data = [d for d in filtered_data if d["model"].lower() == model.lower()]
-    
-    if year:
-        filtered_data = [d for d in filtered_data if d["year"] == year]
-    
-    if is_opportunity is not None:
-        filtered_data = [d for d in filtered_data if d["is_opportunity"] == is_opportunity]
-    
-    # Apply pagination
-    total_count = len(filtered_data)
-    paginated_data = filtered_data[offset:offset + limit]
-    
-    return {
-        "total": total_count,
-        "market_data": paginated_data
-    }
+    version = data_version()
+    not_modified = _not_modified(request, response, version)
+    if not_modified is not None:
+        return not_modified
+    
+    # Normalize the filters so equivalent queries share a cache entry
+    body = _market_data_page(
+        version,
+        _index_key(make) or None,
+        _index_key(model) or None,
+        year or None,
+        is_opportunity,
+        limit,
+        offset,
+    )
+    return _json_body(response, body)
 
 @router.get("/market-data/{vehicle_id}")
 async def get_market_data_for_vehicle(vehicle_id: int):
     """
     Get market data for a specific vehicle
     """
-    _, market_data = load_data()
-    
-    for data in market_data:
-        if data["vehicle_id"] == vehicle_id:
-            return data
+    data = load_dataset()["market_data_by_vehicle_id"].get(vehicle_id)
+    if data is not None:
+        return data
     
     raise HTTPException(status_code=404, detail=f"Market data for vehicle ID {vehicle_id} not found")
 
 @router.get("/opportunities")
 async def get_opportunities(
+    request: Request,
+    response: Response,
     min_percent_difference: float = 5.0,
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
 ):
     """
-    Get undervalued vehicle opportunities
+    Get undervalued vehicle opportunities, largest percent difference first
     """
-    vehicles, market_data = load_data()
-    
-    # Create a lookup dictionary for vehicles by ID
-    vehicle_lookup = {vehicle["id"]: vehicle for vehicle in vehicles}
-    
-    # Find opportunities
-    opportunities = []
-    for data in market_data:
-        if data["percent_difference"] >= min_percent_difference:
-            vehicle_id = data["vehicle_id"]
-            if vehicle_id in vehicle_lookup:
-                # Combine vehicle and market data
-                opportunity = {
-                    **vehicle_lookup[vehicle_id],
-                    "market_data": data
-                }
-                opportunities.append(opportunity)
+    version = data_version()
+    not_modified = _not_modified(request, response, version)
+    if not_modified is not None:
+        return not_modified
+    
+    dataset = load_dataset(version)
+    
+    # Opportunities are presorted, so the matches are a prefix of the list
+    total_count = bisect_right(dataset["opportunity_keys"], -min_percent_difference)
     
     # Apply pagination
-    total_count = len(opportunities)
-    paginated_opportunities = opportunities[offset:offset + limit]
+    paginated_opportunities = dataset["opportunities"][offset:min(offset + limit, total_count)]
     
     return {
         "total": total_count,
@@ -183,55 +344,14 @@ async def get_opportunities(
     }
 
 @router.get("/statistics")
-async def get_statistics():
+async def get_statistics(request: Request, response: Response):
     """
     Get statistical overview of the inventory
     """
-    vehicles, market_data = load_data()
+    version = data_version()
+    not_modified = _not_modified(request, response, version)
+    if not_modified is not None:
+        return not_modified
     
-    # Basic stats
-    total_vehicles = len(vehicles)
-    available_vehicles = sum(1 for v in vehicles if not v["is_sold"])
-    sold_vehicles = sum(1 for v in vehicles if v["is_sold"])
-    
-    # Count by make
-    make_counts = {}
-    for vehicle in vehicles:
-        make = vehicle["make"]
-        if make not in make_counts:
-            make_counts[make] = 0
-        make_counts[make] += 1
-    
-    # Count by condition
-    condition_counts = {}
-    for vehicle in vehicles:
-        condition = vehicle["condition"]
-        if condition not in condition_counts:
-            condition_counts[condition] = 0
-        condition_counts[condition] += 1
-    
-    # Average price by make
-    prices_by_make = {}
-    for vehicle in vehicles:
-        make = vehicle["make"]
-        if make not in prices_by_make:
-            prices_by_make[make] = []
-        prices_by_make[make].append(vehicle["price"])
-    
-    avg_prices_by_make = {
-        make: sum(prices) / len(prices) 
-        for make, prices in prices_by_make.items()
-    }
-    
-    # Count opportunities
-    opportunities_count = sum(1 for d in market_data if d["is_opportunity"])
-    
-    return {
-        "total_vehicles": total_vehicles,
-        "available_vehicles": available_vehicles,
-        "sold_vehicles": sold_vehicles,
-        "make_distribution": make_counts,
-        "condition_distribution": condition_counts,
-        "avg_prices_by_make": avg_prices_by_make,
-        "opportunities_count": opportunities_count
-    } 
\ No newline at end of file
+    # Computed once per data load
+    return load_dataset(version)["statistics"] 
\ No newline at end of file
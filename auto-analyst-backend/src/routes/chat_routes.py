@@ -11,9 +11,9 @@ from src.managers.user_manager import get_current_user, User
 from src.schemas.chat_schemas import *
 from src.utils.logger import Logger
 import os
-from dotenv import load_dotenv
+from src.utils.env import load_env
 
-load_dotenv()
+load_env()
 
 # Initialize logger with console logging disabled
 logger = Logger("chat_routes", see_time=True, console_log=False)
@@ -1,6 +1,7 @@
 import io
 import logging
 import re
+from functools import lru_cache
 from fastapi import APIRouter, Depends, HTTPException, Request
 from typing import Dict, Optional, List, Tuple
 from pydantic import BaseModel
@@ -8,7 +9,7 @@ from pydantic import BaseModel
 from scripts.format_response import execute_code_from_markdown, format_code_block
 from src.utils.logger import Logger
 from src.routes.session_routes import get_session_id_dependency
-from src.agents.agents import code_edit, code_fix
+from src.agents.agents import AGENT_EXECUTOR, code_edit_predictor, code_fix_predictor
 import dspy
 import os
 # Initialize router
@@ -21,6 +22,21 @@ router = APIRouter(
 # Initialize logger
 logger = Logger("code_routes", see_time=True, console_log=False)
 try_logger = Logger("try_code_routes", see_time=True, console_log=False)
+
+# Patterns are compiled once at import; they run over every block of agent code sent for cleaning or fixing
+# Matches a whole line holding a block marker; a line with both markers counts as a start, as in format_code
+_MARKER_LINE_RE = re.compile(
+    r'^(?:(?=[^\n]*?(?P<start>#[^\S\n]+\w+[^\S\n]+code[^\S\n]+start))'
+    r'|(?=[^\n]*?#[^\S\n]+\w+[^\S\n]+code[^\S\n]+end))[^\n]*',
+    re.IGNORECASE | re.MULTILINE,
+)
+_BLOCK_RE = re.compile(r'(#\s+(\w+)\s+code\s+start[\s\S]*?#\s+\w+\s+code\s+end)', re.DOTALL)
+# Start marker, inner code and end marker of a block, captured in one match
+_BLOCK_PARTS_RE = re.compile(r'(#\s+\w+\s+code\s+start)\s*\n([\s\S]*?)(#\s+\w+\s+code\s+end)')
+_ERROR_BANNER_RE = re.compile(r'===\s+ERROR\s+IN\s+([A-Za-z0-9_]+)\s+===\s*([\s\S]*?)(?:(?====\s+)|$)')
+_ERROR_TYPE_RE = re.compile(r'(TypeError|ValueError|AttributeError|IndexError|KeyError|NameError):\s*([^\n]+)')
+_PROBLEM_SECTION_RE = re.compile(r'Problem at this location:([\s\S]*?)(?:\n\n|$)')
+_IMPORT_LINE_RE = re.compile(r'^\s*(import\s+[^\n]+|from\s+[^\n]+import\s+[^\n]+)\n?', re.MULTILINE)
 # Request body model
 class CodeExecuteRequest(BaseModel):
     code: str
@@ -36,6 +52,11 @@ class CodeFixRequest(BaseModel):
 class CodeCleanRequest(BaseModel):
     code: str
     
+@lru_cache(maxsize=4)
+def _get_lm(model: str, api_key: str, max_tokens: int):
+    """Share one LM (and its HTTP client) per model, key and token limit across requests"""
+    return dspy.LM(model, api_key=api_key, max_tokens=max_tokens)
+
 def format_code(code: str) -> str:
     """
     Clean the code by organizing imports and ensuring code blocks are properly formatted.
@@ -49,39 +70,43 @@ def format_code(code: str) -> str:
     # Move imports to top
     code = move_imports_to_top(code)
     
-    # Split code into blocks if they exist (based on comments like '# agent_name code start')
+    # Line endings are normalized so the marker scan only has to handle '\n'
+    text = '\n'.join(code.splitlines())
+    
+    # Without any markers the whole code is a single block
+    if 'code' not in text.lower():
+        return text
+    
+    # Split code into blocks if they exist (based on comments like '# agent_name code start'),
+    # walking the marker lines in a single scan and slicing the blocks out of text
     code_blocks = []
-    current_block = []
-    current_agent = None
-    
-    for line in code.splitlines():
-        if re.search(r'#\s+\w+\s+code\s+start', line.lower()):
-            if current_agent and current_block:
-                code_blocks.append((current_agent, '\n'.join(current_block)))
-                current_block = []
-            current_agent = re.search(r'#\s+(\w+)\s+code\s+start', line.lower()).group(1)
-            current_block.append(line)
-        elif re.search(r'#\s+\w+\s+code\s+end', line.lower()):
-            if current_block:
-                current_block.append(line)
-                code_blocks.append((current_agent, '\n'.join(current_block)))
-                current_agent = None
-                current_block = []
+    block_start = 0
+    in_agent_block = False
+    
+    for marker in _MARKER_LINE_RE.finditer(text):
+        line_start, line_end = marker.span()
+        if marker.group('start') is not None:
+            # A new start marker closes an agent block that never reached its end marker
+            if in_agent_block and block_start < line_start:
+                code_blocks.append(text[block_start:line_start - 1])
+                block_start = line_start
+            in_agent_block = True
         else:
-            current_block.append(line)
+            # An end marker closes the current block; one with no code before it is dropped
+            if block_start < line_start:
+                code_blocks.append(text[block_start:line_end])
+            block_start = line_end + 1
+            in_agent_block = False
     
     # If there's remaining code not in a block
-    if current_block:
-        if current_agent:
-            code_blocks.append((current_agent, '\n'.join(current_block)))
-        else:
-            code_blocks.append(('main', '\n'.join(current_block)))
+    if block_start <= len(text):
+        code_blocks.append(text[block_start:])
     
     # If no blocks were identified, return the original cleaned code
     if not code_blocks:
         return code
     # Reconstruct the code with the identified blocks
-    return '\n\n'.join([block[1] for block in code_blocks])
+    return '\n\n'.join(code_blocks)
 
 def extract_code_blocks(code: str) -> Dict[str, str]:
     """
@@ -94,8 +119,7 @@ def extract_code_blocks(code: str) -> Dict[str, str]:
         Dict[str, str]: Dictionary mapping agent names to their code blocks
     """
     # Find code blocks with start and end markers
-    block_pattern = r'(#\s+(\w+)\s+code\s+start[\s\S]*?#\s+\w+\s+code\s+end)'
-    blocks_with_markers = re.findall(block_pattern, code, re.DOTALL)
+    blocks_with_markers = _BLOCK_RE.findall(code)
     
     if not blocks_with_markers:
         # If no blocks found, treat the entire code as one block
@@ -107,7 +131,7 @@ def extract_code_blocks(code: str) -> Dict[str, str]:
     
     return result
 
-def identify_error_blocks(code: str, error_output: str) -> List[Tuple[str, str, str]]:
+def identify_error_blocks(code: str, error_output: str) -> List[Tuple[str, int, int, str]]:
     """
     Identify code blocks that have errors during execution.
     
@@ -116,23 +140,25 @@ def identify_error_blocks(code: str, error_output: str) -> List[Tuple[str, str,
         error_output (str): The error output from execution
         
     Returns:
-        List[Tuple[str, str, str]]: List of tuples containing (agent_name, block_code, error_message)
+        List[Tuple[str, int, int, str]]: List of tuples containing (agent_name, block_start, block_end, error_message),
+        where code[block_start:block_end] is the block including its markers
     """
     # Parse the error output to find which agents had errors
     faulty_blocks = []
     
     # Find error patterns like "=== ERROR IN AGENT_NAME ==="
-    error_matches = re.findall(r'===\s+ERROR\s+IN\s+([A-Za-z0-9_]+)\s+===\s*([\s\S]*?)(?:(?===\s+)|$)', error_output)
+    if 'ERROR' not in error_output:
+        return []
+    error_matches = _ERROR_BANNER_RE.findall(error_output)
     
     if not error_matches:
         return []
     
     # Find all code blocks in the given code
     blocks = {}
-    for agent_match in re.finditer(r'#\s+(\w+)\s+code\s+start([\s\S]*?)#\s+\w+\s+code\s+end', code, re.DOTALL):
-        agent_name = agent_match.group(1).lower()
-        full_block = agent_match.group(0)
-        blocks[agent_name] = full_block
+    for agent_match in _BLOCK_RE.finditer(code):
+        agent_name = agent_match.group(2).lower()
+        blocks[agent_name] = agent_match.span()
     
     # Match errors with their corresponding code blocks
     matched_blocks = set()
@@ -147,15 +173,15 @@ def identify_error_blocks(code: str, error_output: str) -> List[Tuple[str, str,
         if normalized_name in blocks:
             # Extract the relevant error information
             processed_error = extract_relevant_error_section(error_message)
-            faulty_blocks.append((normalized_name, blocks[normalized_name], processed_error))
+            faulty_blocks.append((normalized_name, *blocks[normalized_name], processed_error))
             matched_blocks.add(normalized_name)
         else:
             # Try fuzzy matching for agent names
-            for block_name, block_code in blocks.items():
+            for block_name, block_span in blocks.items():
                 if block_name not in matched_blocks and (normalized_name in block_name or block_name in normalized_name):
                     # Extract the relevant error information
                     processed_error = extract_relevant_error_section(error_message)
-                    faulty_blocks.append((block_name, block_code, processed_error))
+                    faulty_blocks.append((block_name, *block_span, processed_error))
                     matched_blocks.add(block_name)
                     break
     
@@ -173,6 +199,9 @@ def extract_relevant_error_section(error_message: str) -> str:
     Returns:
         str: The processed error message with the most relevant information
     """
+    if not error_message:
+        return error_message
+    
     error_lines = error_message.strip().split('\n')
     
     # If "Problem at this location" is in the error, focus on that section
@@ -204,6 +233,79 @@ def extract_relevant_error_section(error_message: str) -> str:
     # If the error is short enough, return as is
     return error_message
 
+def fix_error_block(code: str, agent_name: str, block_start: int, block_end: int,
+                    specific_error: str, dataset_context: str, lm) -> Optional[Tuple[int, int, str]]:
+    """
+    Fix a single faulty block found by identify_error_blocks
+    
+    Args:
+        code (str): The full code the block offsets refer to
+        agent_name (str): Name of the agent the block belongs to
+        block_start (int), block_end (int): Offsets of the block, including its markers
+        specific_error (str): The error reported for this block
+        dataset_context (str): Context about the dataset
+        lm: The language model to fix the code with
+    
+    Returns:
+        Optional[Tuple[int, int, str]]: (block_start, block_end, fixed_block), or None if the block could not be fixed
+    """
+    logger.log_message(f"Fixing {agent_name} block", level=logging.INFO)
+    
+    try:
+        block_code = code[block_start:block_end]
+        
+        # Extract the markers and the inner code between them
+        block_match = _BLOCK_PARTS_RE.search(block_code)
+        if not block_match:
+            logger.log_message(f"Could not extract inner code for {agent_name}", level=logging.WARNING)
+            return None
+        
+        start_marker, inner_code, end_marker = block_match.groups()
+        inner_code = inner_code.strip()
+        
+        # Extract the error type and actual error message
+        error_type = ""
+        error_msg = specific_error
+        
+        # Look for common error patterns to provide focused context to the LLM
+        error_type_match = _ERROR_TYPE_RE.search(specific_error)
+        if error_type_match:
+            error_type = error_type_match.group(1)
+            error_msg = f"{error_type}: {error_type_match.group(2)}"
+        
+        # Add problem location if available
+        if "Problem at this location:" in specific_error:
+            problem_section = _PROBLEM_SECTION_RE.search(specific_error)
+            if problem_section:
+                error_msg = f"{error_msg}\n\nProblem at: {problem_section.group(1).strip()}"
+        
+        # Fix only the inner code
+        with dspy.context(lm=lm):
+            result = code_fix_predictor(
+                dataset_context=dataset_context,
+                faulty_code=inner_code,
+                error=error_msg,
+            )
+        
+        # Ensure the fixed code is properly stripped and doesn't include markers
+        fixed_inner_code = result.fixed_code.strip()
+        if fixed_inner_code.startswith('#') and 'code start' in fixed_inner_code:
+            # If LLM included markers in response, extract only inner code
+            inner_match = _BLOCK_PARTS_RE.search(fixed_inner_code)
+            if inner_match:
+                fixed_inner_code = inner_match.group(2).strip()
+        
+        # Reconstruct the block with fixed code
+        fixed_block = f"{start_marker}\n\n{fixed_inner_code}\n\n{end_marker}"
+        
+        logger.log_message(f"Fixed {agent_name} block successfully", level=logging.INFO)
+        return block_start, block_end, fixed_block
+        
+    except Exception as e:
+        # Log the error so the other blocks can still be fixed
+        logger.log_message(f"Error fixing {agent_name} block: {str(e)}", level=logging.ERROR)
+        return None
+
 def fix_code_with_dspy(code: str, error: str, dataset_context: str = ""):
     """
     Fix code with errors by identifying faulty blocks and fixing them individually
@@ -216,96 +318,47 @@ def fix_code_with_dspy(code: str, error: str, dataset_context: str = ""):
     Returns:
         str: The fixed code
     """
-    gemini = dspy.LM("gemini/gemini-2.5-pro-preview-03-25", api_key = os.environ['GEMINI_API_KEY'], max_tokens=5000)
+    gemini = _get_lm("gemini/gemini-2.5-pro-preview-03-25", os.environ['GEMINI_API_KEY'], 5000)
+    
+    # Start with the original code
+    result_code = code.replace("```python", "").replace("```", "")
     
     # Find the blocks with errors
-    faulty_blocks = identify_error_blocks(code, error)
+    faulty_blocks = identify_error_blocks(result_code, error)
     logger.log_message(f"Number of faulty blocks found: {len(faulty_blocks)}", level=logging.INFO)
     if not faulty_blocks:
         # If no specific errors found, fix the entire code
         with dspy.context(lm=gemini):
-            code_fixer = dspy.ChainOfThought(code_fix)
-            result = code_fixer(
-                dataset_context=str(dataset_context) or "",
-                faulty_code=str(code) or "",
-                error=str(error) or "",
+            result = code_fix_predictor(
+                dataset_context=dataset_context,
+                faulty_code=code,
+                error=error,
             )
             return result.fixed_code
     
-    # Start with the original code
-    result_code = code.replace("```python", "").replace("```", "")
-    
-    # Fix each faulty block separatelyw
-    with dspy.context(lm=gemini):
-        code_fixer = dspy.ChainOfThought(code_fix)
-        
-        for agent_name, block_code, specific_error in faulty_blocks:
-            logger.log_message(f"Fixing {agent_name} block", level=logging.INFO)
-            
-            try:
-                # Extract inner code between the markers
-                inner_code_match = re.search(r'#\s+\w+\s+code\s+start\s*\n([\s\S]*?)#\s+\w+\s+code\s+end', block_code)
-                if not inner_code_match:
-                    logger.log_message(f"Could not extract inner code for {agent_name}", level=logging.WARNING)
-                    continue
-                    
-                inner_code = inner_code_match.group(1).strip()
-                
-                # Find markers
-                start_marker_match = re.search(r'(#\s+\w+\s+code\s+start)', block_code)
-                end_marker_match = re.search(r'(#\s+\w+\s+code\s+end)', block_code)
-                
-                if not start_marker_match or not end_marker_match:
-                    logger.log_message(f"Could not find start/end markers for {agent_name}", level=logging.WARNING)
-                    continue
-                    
-                start_marker = start_marker_match.group(1)
-                end_marker = end_marker_match.group(1)
-                
-                # Extract the error type and actual error message
-                error_type = ""
-                error_msg = specific_error
-                
-                # Look for common error patterns to provide focused context to the LLM
-                error_type_match = re.search(r'(TypeError|ValueError|AttributeError|IndexError|KeyError|NameError):\s*([^\n]+)', specific_error)
-                if error_type_match:
-                    error_type = error_type_match.group(1)
-                    error_msg = f"{error_type}: {error_type_match.group(2)}"
-                
-                # Add problem location if available
-                if "Problem at this location:" in specific_error:
-                    problem_section = re.search(r'Problem at this location:([\s\S]*?)(?:\n\n|$)', specific_error)
-                    if problem_section:
-                        error_msg = f"{error_msg}\n\nProblem at: {problem_section.group(1).strip()}"
-                
-                # Fix only the inner code
-                result = code_fixer(
-                    dataset_context=str(dataset_context) or "",
-                    faulty_code=str(inner_code) or "",
-                    error=str(error_msg) or "",
-                )   
-                
-                # Ensure the fixed code is properly stripped and doesn't include markers
-                fixed_inner_code = result.fixed_code.strip()
-                if fixed_inner_code.startswith('#') and 'code start' in fixed_inner_code:
-                    # If LLM included markers in response, extract only inner code
-                    inner_match = re.search(r'#\s+\w+\s+code\s+start\s*\n([\s\S]*?)#\s+\w+\s+code\s+end', fixed_inner_code)
-                    if inner_match:
-                        fixed_inner_code = inner_match.group(1).strip()
-                
-                # Reconstruct the block with fixed code
-                fixed_block = f"{start_marker}\n\n{fixed_inner_code}\n\n{end_marker}"
-                
-                # Replace the original block with the fixed block in the full code
-                result_code = result_code.replace(block_code, fixed_block)
-                logger.log_message(f"Fixed {agent_name} block successfully", level=logging.INFO)
-                
-            except Exception as e:
-                # Log the error but continue with other blocks
-                logger.log_message(f"Error fixing {agent_name} block: {str(e)}", level=logging.ERROR)
-                continue
-    
-    return result_code
+    # The blocks are independent, so their LM calls run concurrently
+    fixes = AGENT_EXECUTOR.map(
+        lambda block: fix_error_block(result_code, *block, dataset_context, gemini),
+        faulty_blocks,
+    )
+    fixes = [fix for fix in fixes if fix is not None]
+    
+    # Splice the fixed blocks into the code in a single pass
+    parts = []
+    cursor = 0
+    for block_start, block_end, fixed_block in sorted(fixes, key=lambda fix: fix[0]):
+        if block_start < cursor:
+            # The same block was matched by more than one error; keep the first fix
+            continue
+        parts.append(result_code[cursor:block_start])
+        parts.append(fixed_block)
+        cursor = block_end
+    parts.append(result_code[cursor:])
+    
+    return "".join(parts)
+
+# Sample values for the dataset context are looked for in this many leading rows first
+SAMPLE_SCAN_ROWS = 100
 
 def get_dataset_context(df):
     """
@@ -322,39 +375,63 @@ def get_dataset_context(df):
     
     try:
         # Get basic dataframe info
-        col_types = df.dtypes.to_dict()
-        null_counts = df.isnull().sum().to_dict()
+        col_types = df.dtypes
+        null_counts = df.isnull().sum()
         
         # Format the context string
-        context = "Dataset context:\n"
-        context += f"- Shape: {df.shape[0]} rows, {df.shape[1]} columns\n"
-        context += "- Columns and types:\n"
-        
-        for col, dtype in col_types.items():
-            null_count = null_counts.get(col, 0)
-            null_percent = (null_count / len(df)) * 100 if len(df) > 0 else 0
-            context += f"  * {col} ({dtype}): {null_count} null values\n"
+        lines = [
+            "Dataset context:",
+            f"- Shape: {df.shape[0]} rows, {df.shape[1]} columns",
+            "- Columns and types:",
+        ]
+        lines.extend(
+            f"  * {col} ({dtype}): {null_count} null values"
+            for col, dtype, null_count in zip(df.columns, col_types, null_counts)
+        )
         
-        # Add sample values for each column (first 2 non-null values)
-        context += "- Sample values:\n"
-        for col in df.columns:
-            sample_values = df[col].dropna().head(2).tolist()
+        # Add sample values for each column (first 2 non-null values), looking in the
+        # first rows and only scanning the whole column when they hold too few
+        lines.append("- Sample values:")
+        head = df.head(SAMPLE_SCAN_ROWS)
+        for i, (col, dtype) in enumerate(zip(df.columns, col_types)):
+            sample_values = head.iloc[:, i].dropna().head(2).tolist()
+            if len(sample_values) < 2 and len(df) > SAMPLE_SCAN_ROWS:
+                sample_values = df.iloc[:, i].dropna().head(2).tolist()
             # if float, round to 2 decimal places
-            if df[col].dtype == "float64":
+            if dtype == "float64":
                 sample_values = [round(v, 1) for v in sample_values]
             sample_str = ", ".join(str(v) for v in sample_values)
-            context += f"  * {col}: {sample_str}\n"
-        return context
+            lines.append(f"  * {col}: {sample_str}")
+        return "\n".join(lines) + "\n"
     except Exception as e:
         logger.log_message(f"Error generating dataset context: {str(e)}", level=logging.ERROR)
         return "Could not generate dataset context information."
 
+def get_session_dataset_context(session_state) -> str:
+    """
+    Dataset context for the session's dataframe, reused until the dataframe changes.
+    Uploading or linking a dataset replaces the session state, which drops the cached context.
+    
+    Args:
+        session_state: The session's state dictionary
+        
+    Returns:
+        String with dataset information (columns, types, null values)
+    """
+    df = session_state["current_df"]
+    key = None if df is None else (id(df), df.shape, tuple(df.columns), tuple(df.dtypes))
+    cached = session_state.get("dataset_context")
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    
+    context = get_dataset_context(df)
+    session_state["dataset_context"] = (key, context)
+    return context
+
 def edit_code_with_dspy(original_code: str, user_prompt: str, dataset_context: str = ""):
-    gemini = dspy.LM("claude-3-5-sonnet-latest", api_key = os.environ['ANTHROPIC_API_KEY'], max_tokens=3000)
+    gemini = _get_lm("claude-3-5-sonnet-latest", os.environ['ANTHROPIC_API_KEY'], 3000)
     with dspy.context(lm=gemini):
-        code_editor = dspy.ChainOfThought(code_edit)
-        
-        result = code_editor(
+        result = code_edit_predictor(
             dataset_context=dataset_context,
             original_code=original_code,
             user_prompt=user_prompt,
@@ -371,15 +448,16 @@ def move_imports_to_top(code: str) -> str:
     Returns:
         str: The cleaned code with import statements at the top.
     """
-    # Extract import statements
-    import_statements = re.findall(
-        r'^\s*(import\s+[^\n]+|from\s+[^\n]+import\s+[^\n]+)', code, flags=re.MULTILINE
-    )
-    
-    # Remove import statements from original code
-    code_without_imports = re.sub(
-        r'^\s*(import\s+[^\n]+|from\s+[^\n]+import\s+[^\n]+)\n?', '', code, flags=re.MULTILINE
-    )
+    # Collect the import statements and the code between them in a single pass
+    import_statements = []
+    remaining = []
+    cursor = 0
+    for match in _IMPORT_LINE_RE.finditer(code):
+        import_statements.append(match.group(1))
+        remaining.append(code[cursor:match.start()])
+        cursor = match.end()
+    remaining.append(code[cursor:])
+    code_without_imports = ''.join(remaining)
     
     # Deduplicate and sort imports
     sorted_imports = sorted(set(import_statements))
@@ -424,6 +502,8 @@ async def execute_code(
             
         # Execute the code with the dataframe from session state
         output, json_outputs = execute_code_from_markdown(code, session_state["current_df"])
+        # The code may have modified the dataframe in place
+        session_state.pop("dataset_context", None)
         
         # Format plotly outputs for frontend
         plotly_outputs = [f"```plotly\n{json_output}\n```\n" for json_output in json_outputs]
@@ -464,7 +544,7 @@ async def edit_code(
         session_state = app_state.get_session_state(session_id)
         
         # Get dataset context
-        dataset_context = get_dataset_context(session_state["current_df"])
+        dataset_context = get_session_dataset_context(session_state)
         logger.log_message(f"Dataset context: {dataset_context}", level=logging.INFO)
         logger.log_message(f"Original code: {request_data.original_code}", level=logging.INFO)
         logger.log_message(f"User prompt: {request_data.user_prompt}", level=logging.INFO)
@@ -521,7 +601,7 @@ async def fix_code(
         session_state = app_state.get_session_state(session_id)
         
         # Get dataset context
-        dataset_context = get_dataset_context(session_state["current_df"])
+        dataset_context = get_session_dataset_context(session_state)
         
         try:
             # Use the code_fix agent to fix the code, with dataset context
@@ -25,11 +25,15 @@ async def get_exported_file(file_name: str):
     
     file_path = os.path.join(EXPORTS_DIR, file_name)
     
-    if not os.path.exists(file_path):
+    # One stat serves both the existence check and the response headers
+    try:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"File {file_name} not found")
     
     return FileResponse(
         path=file_path, 
         filename=file_name,
-        media_type='text/csv'
+        media_type='text/csv',
+        stat_result=stat_result
     ) 
\ No newline at end of file
@@ -15,6 +15,17 @@ router = APIRouter(
 UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Uploads are copied to disk in chunks of this size rather than read into memory whole
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Column types and samples for a CSV upload are taken from its first rows only
+SCHEMA_SAMPLE_ROWS = 1000
+CSV_COUNT_CHUNK_ROWS = 100_000
+
+def count_csv_rows(path: str) -> int:
+    """Count data rows the way pandas parses them, one column and one chunk at a time"""
+    return sum(len(chunk) for chunk in pd.read_csv(path, usecols=[0], chunksize=CSV_COUNT_CHUNK_ROWS))
+
 @router.post("/upload")
 async def upload_file(file: UploadFile = File(...), session_id: Optional[str] = None):
     """
@@ -41,17 +52,19 @@ async def upload_file(file: UploadFile = File(...), session_id: Optional[str] =
     try:
         # Save the file
         with open(dest_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                f.write(chunk)
         
         # Get file metadata
         file_info = {"filename": file.filename, "size_bytes": os.path.getsize(dest_path)}
         
         # Load into pandas to extract schema information
         if file_ext == '.csv':
-            df = pd.read_csv(dest_path)
+            df = pd.read_csv(dest_path, nrows=SCHEMA_SAMPLE_ROWS)
+            row_count = len(df) if len(df) < SCHEMA_SAMPLE_ROWS else count_csv_rows(dest_path)
         else:  # Excel
             df = pd.read_excel(dest_path)
+            row_count = len(df)
         
         # Extract schema info
         columns_info = []
@@ -65,7 +78,7 @@ async def upload_file(file: UploadFile = File(...), session_id: Optional[str] =
             })
         
         # Get basic stats
-        file_info["rows"] = len(df)
+        file_info["rows"] = row_count
         file_info["columns"] = len(df.columns)
         file_info["schema"] = columns_info
         
@@ -1,3 +1,4 @@
+import hashlib
 import io
 import logging
 import json
@@ -13,7 +14,8 @@ from pydantic import BaseModel
 from src.managers.session_manager import get_session_id
 from src.schemas.model_settings import ModelSettings
 from src.utils.logger import Logger
-from src.agents.agents import dataset_description_agent
+from src.utils.prediction_cache import PredictionCache, stable_hash
+from src.agents.agents import dataset_description_predictor
 import dspy
 
 
@@ -24,6 +26,31 @@ X_SESSION_ID = APIKeyHeader(name="X-Session-ID", auto_error=False)
 
 router = APIRouter(tags=["session"])
 
+# Descriptions are deterministic enough per dataset to reuse across uploads
+DESCRIPTION_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+description_cache = PredictionCache(maxsize=512, ttl=DESCRIPTION_CACHE_TTL_SECONDS, name="dataset_description")
+
+
+def schema_fingerprint(df: pd.DataFrame) -> str:
+    """Cheap content key for a dataframe: shape, columns sorted by name with
+    their dtypes and null counts, and a hash of the first rows of each column.
+    Columns are taken by position so duplicate names are fine"""
+    positions = sorted(range(df.shape[1]), key=lambda i: str(df.columns[i]))
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(df.shape).encode())
+    digest.update(repr([(str(df.columns[i]), str(df.dtypes.iloc[i])) for i in positions]).encode())
+    digest.update(df.iloc[:, positions].isna().sum().values.tobytes())
+    head = df.iloc[:128, positions]
+    for i in range(head.shape[1]):
+        col = head.iloc[:, i]
+        try:
+            hashed = pd.util.hash_pandas_object(col, index=False)
+        except TypeError:
+            # Cells holding lists or dicts can't be hashed directly
+            hashed = pd.util.hash_pandas_object(col.astype(str), index=False)
+        digest.update(hashed.values.tobytes())
+    return digest.hexdigest()
+
 # Dependency to get app state
 def get_app_state(request: Request):
     return request.app.state
@@ -500,6 +527,18 @@ async def create_dataset_description(
         existing_description = request.get("existingDescription", "")
         
         
+        # Check the cache before building the (costly) describe() payload.
+        # A frame that can't be fingerprinted just skips the cache
+        try:
+            cache_key = stable_hash(schema_fingerprint(df), existing_description or "")
+        except Exception as e:
+            logger.log_message(f"Skipping description cache: {e}", level=logging.WARNING)
+            cache_key = None
+        if cache_key is not None:
+            cached_description = description_cache.get(cache_key)
+            if cached_description is not None:
+                return {"description": cached_description}
+        
         # Convert dataframe to a string representation for the agent
         dataset_info = {
             "columns": df.columns.tolist(),
@@ -518,12 +557,13 @@ async def create_dataset_description(
         # Generate description using session model
         with dspy.context(lm=lm):
             # If there's an existing description, have the agent improve it
-            description = dspy.Predict(dataset_description_agent)(
+            description = dataset_description_predictor(
                 dataset=str(dataset_info),
                 existing_description=existing_description
             )
-            
         
+        if cache_key is not None:
+            description_cache.set(cache_key, description.description)
         return {"description": description.description}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate description: {str(e)}")
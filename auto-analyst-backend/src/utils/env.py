@@ -0,0 +1,12 @@
+"""
+Loads the .env file into os.environ once per process.
+"""
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+
+@lru_cache(maxsize=1)
+def load_env() -> bool:
+    """Parse .env on the first call only; later calls are a cache hit"""
+    return load_dotenv()
@@ -1,9 +1,11 @@
 import os
 import time
 import logging
-from dotenv import load_dotenv
+from contextlib import contextmanager
+from contextvars import ContextVar
+from src.utils.env import load_env
 
-load_dotenv()
+load_env()
 
 class Logger:
     def __init__(self, name: str, see_time: bool = False, console_log: bool = False, level: int = logging.INFO):
@@ -30,19 +32,21 @@ class Logger:
             console_handler.setFormatter(formatter)
             self.logger.addHandler(console_handler)
 
-    def log_message(self, message: str, level: int = logging.INFO):
+    def log_message(self, message: str, *args, level: int = logging.INFO):
+        # Extra args are %-formatted by logging only if the record is emitted,
+        # so hot paths can skip building large messages
         if not self.is_dev:
             return
         if level == logging.INFO:
-            self.logger.info(message)
+            self.logger.info(message, *args)
         elif level == logging.ERROR:
-            self.logger.error(message)
+            self.logger.error(message, *args)
         elif level == logging.WARNING:
-            self.logger.warning(message)
+            self.logger.warning(message, *args)
         elif level == logging.DEBUG:
-            self.logger.debug(message)
+            self.logger.debug(message, *args)
         else:
-            self.logger.info(message)
+            self.logger.info(message, *args)
 
     def disable_logging(self):
         self.logger.disabled = True
@@ -59,3 +63,44 @@ def log_time(func):
         logger.log_message(f"Function: {func.__name__}, Execution time: {round(end_time - start_time, 5)} seconds")
         return result
     return wrapper
+
+
+# Stage timings for the request being handled; None outside a timing_scope.
+# Worker threads started through asyncio.to_thread/ctx.run see the same list
+_stage_timings = ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Record the duration of the block under the active timing_scope, if any"""
+    timings = _stage_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        timings.append((stage, time.perf_counter_ns() - start))
+
+
+@contextmanager
+def timing_scope(name: str, logger: Logger):
+    """Collect stage_timer records made inside the block and log them as one line"""
+    timings = []
+    token = _stage_timings.set(timings)
+    start = time.perf_counter_ns()
+    try:
+        yield timings
+    finally:
+        try:
+            _stage_timings.reset(token)
+        except ValueError:
+            # A streaming generator closed from another context (client
+            # disconnect) can't reset here; that context never saw the list
+            pass
+        total_ms = (time.perf_counter_ns() - start) / 1e6
+        stages = ", ".join(f"{stage}={ns / 1e6:.1f}" for stage, ns in timings)
+        logger.log_message(
+            "%s stage timings (ms): total=%.1f, %s", name, total_ms, stages
+        )
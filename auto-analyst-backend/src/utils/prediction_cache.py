@@ -0,0 +1,93 @@
+"""
+In-process cache for LM outputs that depend only on their inputs.
+Used to skip repeat calls to cheap, highly repetitive agents such as
+chat naming and dataset descriptions.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from src.utils.logger import Logger
+
+logger = Logger("prediction_cache", see_time=True, console_log=False)
+
+# Log each cache's hit rate once per this many lookups
+STATS_LOG_INTERVAL = 200
+
+
+def stable_hash(*parts: str) -> str:
+    """Hash the given strings into a short, process-independent cache key"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """Thread-safe LRU cache mapping an input key to a stored output.
+
+    Entries optionally expire ``ttl`` seconds after they were stored.
+    Hits and misses are counted so the hit rate can be checked in the logs.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: Optional[float] = None, name: str = "cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._lookup(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            lookups = self.hits + self.misses
+            hits = self.hits
+        if lookups % STATS_LOG_INTERVAL == 0:
+            logger.log_message(
+                "%s hit rate: %d/%d (%.1f%%)",
+                self.name, hits, lookups, 100 * hits / lookups,
+            )
+        return value
+
+    def _lookup(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,51 @@
+"""
+DSPy adapter that marks the static signature prompt as a prompt-cache
+breakpoint for providers that need an explicit marker (Anthropic).
+"""
+from contextvars import ContextVar
+
+import dspy
+
+# Set per call so concurrent agent threads don't share the flag
+_mark_cache_breakpoint = ContextVar("mark_cache_breakpoint", default=False)
+
+
+def supports_cache_control(lm) -> bool:
+    """Anthropic only caches prefixes marked with cache_control"""
+    model = str(getattr(lm, "model", "")).lower()
+    return model.startswith("anthropic/") or "claude" in model
+
+
+class PromptCachingChatAdapter(dspy.ChatAdapter):
+    """ChatAdapter that caches the system prompt on Anthropic models.
+
+    The system message carries only the signature instructions and field
+    descriptions, while dataset, goal and plan_instructions go in the user
+    message, so marking the system block keeps the dynamic inputs out of
+    the cached prefix. OpenAI caches long prefixes automatically and gets
+    the messages unchanged.
+    """
+
+    def __call__(self, lm, lm_kwargs, signature, demos, inputs, *args, **kwargs):
+        token = _mark_cache_breakpoint.set(supports_cache_control(lm))
+        try:
+            return super().__call__(lm, lm_kwargs, signature, demos, inputs, *args, **kwargs)
+        finally:
+            _mark_cache_breakpoint.reset(token)
+
+    def format(self, signature, demos, inputs):
+        messages = super().format(signature, demos, inputs)
+        if not _mark_cache_breakpoint.get() or not messages:
+            return messages
+
+        system = messages[0]
+        if system.get("role") == "system" and isinstance(system.get("content"), str):
+            messages[0] = {
+                "role": "system",
+                "content": [{
+                    "type": "text",
+                    "text": system["content"],
+                    "cache_control": {"type": "ephemeral"},
+                }],
+            }
+        return messages
@@ -0,0 +1,46 @@
+"""
+Shrinks signature docstrings, which dspy sends as the system prompt on
+every call, by dropping layout-only markdown.
+"""
+import os
+import re
+
+_BOLD_RE = re.compile(r"\*\*([^*\n]+)\*\*")
+
+
+def minify_prompt(prompt):
+    """Strip layout-only markdown and whitespace from a signature prompt.
+
+    Rules (---), bold markers, trailing whitespace and blank-line runs are
+    removed outside code fences; fenced examples are kept verbatim since
+    agents copy them.
+    """
+    lines = []
+    in_code = False
+    for line in prompt.splitlines():
+        is_fence = line.strip().startswith("```")
+        if in_code and not is_fence:
+            lines.append(line)
+            continue
+        if is_fence:
+            in_code = not in_code
+        line = line.rstrip()
+        if line.strip() == "---":
+            continue
+        if not is_fence:
+            line = _BOLD_RE.sub(r"\1", line)
+        if not line and lines and not lines[-1]:
+            continue
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def minify_signature_prompts(*signatures):
+    """Replace each signature's instructions with the minified docstring.
+
+    Set VERBOSE_AGENT_PROMPTS=1 to keep the original text.
+    """
+    if os.getenv("VERBOSE_AGENT_PROMPTS", "0") == "1":
+        return
+    for signature in signatures:
+        signature.__doc__ = minify_prompt(signature.__doc__)